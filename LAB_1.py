@@ -1,5 +1,12 @@
 import random
 
+from automaton_format import DEAD, save_dfa
+
+try:
+    import numpy as np
+except ImportError:  # accepts_many falls back to the pure-Python table walk
+    np = None
+
 class Grammar:
     def __init__(self):
         self.VN = {"S", "B", "C", "D"}  # Non-terminals
@@ -12,24 +19,140 @@ class Grammar:
         }
         self.start_symbol = "S"
     
+    def _rules(self):
+        """Split each right-linear production into (terminal prefix, trailing non-terminal or None)."""
+        rules = {}
+        for non_terminal, productions in self.P.items():
+            for production in productions:
+                if production and production[-1] in self.VN:
+                    prefix, next_symbol = production[:-1], production[-1]
+                else:
+                    prefix, next_symbol = production, None
+                if any(symbol in self.VN for symbol in prefix) or (next_symbol and not prefix):
+                    raise ValueError(f"Production {non_terminal} -> {production} is not right-linear")
+                rules.setdefault(non_terminal, []).append((prefix, next_symbol))
+        return rules
+
+    def _word_dfa(self):
+        """Determinize the productions over terminals; returns (rows, finals), state 0 is the start symbol.
+
+        Distinct words are distinct paths here, even when the grammar derives a
+        word in several ways.
+        """
+        rules = self._rules()
+        end = None  # NFA state after the last terminal of a production without a non-terminal
+
+        def moves(state):
+            # NFA states: a non-terminal, end, or (non-terminal, rule index, terminals read)
+            if state is end:
+                return
+            if isinstance(state, tuple):
+                non_terminal, r, read = state
+                alternatives = [(r, rules[non_terminal][r])]
+            else:
+                non_terminal, read = state, 0
+                alternatives = enumerate(rules.get(state, ()))
+            for r, (prefix, next_symbol) in alternatives:
+                if read < len(prefix):
+                    target = (non_terminal, r, read + 1) if read + 1 < len(prefix) else next_symbol
+                    yield prefix[read], target
+
+        def accepting(state):
+            return state is end or (isinstance(state, str) and ("", None) in rules.get(state, ()))
+
+        start = frozenset([self.start_symbol])
+        subsets, index, rows = [start], {start: 0}, []
+        for subset in subsets:  # grows while iterating: breadth-first over reachable subsets
+            targets = {}
+            for state in subset:
+                for symbol, target in moves(state):
+                    targets.setdefault(symbol, set()).add(target)
+            row = {}
+            for symbol in sorted(targets):
+                target = frozenset(targets[symbol])
+                if target not in index:
+                    index[target] = len(subsets)
+                    subsets.append(target)
+                row[symbol] = index[target]
+            rows.append(row)
+        return rows, [any(map(accepting, subset)) for subset in subsets]
+
+    def count_strings(self, max_length=10):
+        """Count distinct words per (word-DFA state, length) for every length up to max_length.
+
+        Returns (rows, counts); counts[0][n] is the number of words of length n.
+        """
+        rows, counts = self._counts(max_length)
+        return rows, [row[:max_length + 1] for row in counts]
+
+    def _counts(self, max_length):
+        # cached until the productions change; the table may run past max_length
+        key = (self.start_symbol, tuple(sorted(self.VN)), tuple(sorted(self.VT)),
+               tuple(sorted((head, tuple(bodies)) for head, bodies in self.P.items())))
+        cached = getattr(self, "_count_cache", None)
+        if cached is not None and cached[0] == key and len(cached[2][0]) > max_length:
+            return cached[1], cached[2]
+        rows, finals = self._word_dfa()
+        counts = [[int(final)] + [0] * max_length for final in finals]
+        for n in range(1, max_length + 1):
+            for state, row in enumerate(rows):
+                counts[state][n] = sum(counts[target][n - 1] for target in row.values())
+        self._count_cache = (key, rows, counts)
+        return rows, counts
+
+    def _unrank(self, rows, counts, length, rank):
+        """Build the rank-th word of the given length, in symbol order, by walking the word DFA."""
+        parts = []
+        state = 0
+        while length:
+            for symbol, target in rows[state].items():
+                options = counts[target][length - 1]
+                if rank < options:
+                    break
+                rank -= options
+            parts.append(symbol)
+            state, length = target, length - 1
+        return "".join(parts)
+
+    def sample_strings(self, count=5, max_length=10, rng=random, unique=True):
+        """Draw count strings of length <= max_length uniformly, without rejection.
+
+        With unique=False the draws are independent and may repeat. rng is the
+        random module or a random.Random instance.
+        """
+        rows, counts = self._counts(max_length)
+        per_length = counts[0][:max_length + 1]
+        total = sum(per_length)
+        if count > total and (unique or not total):
+            raise ValueError(f"Only {total} distinct strings of length <= {max_length}, cannot generate {count}")
+
+        if unique:
+            # Floyd's algorithm: count distinct ranks in count draws, even when total exceeds sys.maxsize
+            ranks = set()
+            for upper in range(total - count, total):
+                rank = rng.randrange(upper + 1)
+                ranks.add(upper if rank in ranks else rank)
+            ranks = list(ranks)
+            rng.shuffle(ranks)
+        else:
+            ranks = [rng.randrange(total) for _ in range(count)]
+
+        strings = []
+        for rank in ranks:
+            length = 0
+            while rank >= per_length[length]:
+                rank -= per_length[length]
+                length += 1
+            strings.append(self._unrank(rows, counts, length, rank))
+        return strings
+
     def generate_string(self, max_length=10):
         """Generate a random valid string based on the grammar rules."""
-        word = self.start_symbol
-        while any(symbol in self.VN for symbol in word) and len(word) < max_length:
-            for i, symbol in enumerate(word):
-                if symbol in self.VN:
-                    replacement = random.choice(self.P[symbol])  # Choose a random rule
-                    word = word[:i] + replacement + word[i+1:]  # Replace non-terminal
-                    break  # Apply one rule per iteration
-        return word if all(s not in self.VN for s in word) else self.generate_string(max_length)  # Ensure only terminals remain
-    
-    def generate_strings(self, count=5):
+        return self.sample_strings(1, max_length)[0]
+
+    def generate_strings(self, count=5, max_length=10):
         """Generate multiple unique valid strings from the grammar."""
-        unique_strings = set()
-        while len(unique_strings) < count:
-            new_string = self.generate_string()
-            unique_strings.add(new_string)
-        return list(unique_strings)
+        return self.sample_strings(count, max_length)
 
 class FiniteAutomaton:
     def __init__(self, grammar):
@@ -47,25 +170,196 @@ class FiniteAutomaton:
                 else:
                     symbol, next_state = production[0], production[1:]  # Extract transition details
                     self.transitions.setdefault((non_terminal, symbol), []).append(next_state)
+        self._compiled = None
+
+    def compile(self):
+        """Determinize once into a flat table; row 0 is the dead state, column k unknown symbols, k + 1 padding."""
+        if self._compiled is not None:
+            return self._compiled
+        symbols = sorted(self.alphabet)
+        symbol_index = {symbol: j for j, symbol in enumerate(symbols)}
+        width = len(symbols) + 2
+        names = sorted(self.states)
+        bit = {name: 1 << i for i, name in enumerate(names)}
+
+        start = bit[self.start_state]
+        subsets = [0, start]  # dense ids: 0 = dead, 1 = start
+        seen = {0: 0, start: 1}
+        table = []
+        finals = []
+        i = 0
+        while i < len(subsets):
+            mask = subsets[i]
+            row = [0] * width
+            for j, symbol in enumerate(symbols):
+                target = 0
+                for name in names:
+                    if mask & bit[name]:
+                        for next_state in self.transitions.get((name, symbol), ()):
+                            target |= bit.get(next_state, 0)
+                if target not in seen:
+                    seen[target] = len(subsets)
+                    subsets.append(target)
+                row[j] = seen[target]
+            row[width - 1] = i  # padding leaves the state unchanged
+            table.extend(row)
+            finals.append(any(mask & bit[name] for name in self.final_states if name in bit))
+            i += 1
+
+        self._compiled = (table, finals, symbol_index, width)
+        if np is not None:
+            self._np_table = np.array(table, dtype=np.int32).reshape(-1, width)
+            self._np_finals = np.array(finals, dtype=bool)
+            self._np_symbols = np.array([ord(symbol) for symbol in symbols], dtype=np.uint32)
+        return self._compiled
+
+    def save(self, path):
+        """Write the compiled table for automaton_format.load_dfa.
+
+        The sink row 0 and the unknown and padding columns are dropped, so state i + 1
+        here is state i in the file and transitions into the sink become DEAD.
+        """
+        table, finals, symbol_index, width = self.compile()
+        k = len(symbol_index)
+        targets = [target - 1 if target else DEAD
+                   for state in range(1, len(finals)) for target in table[state * width:state * width + k]]
+        save_dfa(path, sorted(symbol_index, key=symbol_index.get), targets, finals[1:], start=0)
 
     def accepts(self, input_string):
         """Check if the input string is accepted by the FA."""
-        current_states = {self.start_state}  # Start from initial state
+        table, finals, symbol_index, width = self.compile()
+        unknown = width - 2
+        state = 1  # start state
         for symbol in input_string:
-            next_states = set()
-            for state in current_states:
-                if (state, symbol) in self.transitions:
-                    next_states.update(self.transitions[(state, symbol)])  # Move to next states
-            if not next_states:
+            state = table[state * width + symbol_index.get(symbol, unknown)]
+            if not state:
                 return False  # If no valid transitions, reject string
-            current_states = next_states  # Update current states
-        return any(state in self.final_states for state in current_states)  # Check if any final state is reached
+        return finals[state]
+
+    def matcher(self):
+        return StreamMatcher(self)
+
+    def accepts_many(self, strings, batch_size=65536, max_cells=1 << 22, max_length=4096):
+        """Check a batch of strings at once; returns a boolean array (a list without NumPy).
+
+        Strings are grouped by length so padding stays small, and each NumPy batch
+        holds at most max_cells symbols; strings longer than max_length are walked
+        one at a time with accepts.
+        """
+        strings = list(strings)
+        if np is None or not all(isinstance(s, str) for s in strings):
+            return [self.accepts(s) for s in strings]
+        self.compile()
+        result = np.empty(len(strings), dtype=bool)
+        lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+        order = np.argsort(lengths, kind="stable")
+        cut = int(np.searchsorted(lengths[order], max_length, side="right"))
+        for index in order[cut:].tolist():
+            result[index] = self.accepts(strings[index])
+        lo = 0
+        while lo < cut:
+            longest = int(lengths[order[min(lo + batch_size, cut) - 1]])
+            rows = max(1, min(batch_size, max_cells // max(longest, 1)))
+            batch = order[lo:min(lo + rows, cut)]
+            result[batch] = self._accepts_batch([strings[index] for index in batch.tolist()])
+            lo += len(batch)
+        return result
+
+    def _accepts_batch(self, strings):
+        table, width = self._np_table, self._np_table.shape[1]
+        lengths = np.fromiter((len(s) for s in strings), dtype=np.int64, count=len(strings))
+        codes = np.full((len(strings), int(lengths.max(initial=0))), width - 1, dtype=np.int32)
+        if codes.size:
+            # surrogatepass: lone surrogates are valid str symbols and simply not in the alphabet
+            points = np.frombuffer("".join(strings).encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+            symbols = self._np_symbols
+            index = np.searchsorted(symbols, points)
+            known = index < len(symbols)
+            known[known] = symbols[index[known]] == points[known]
+            index[~known] = width - 2
+            codes[np.arange(codes.shape[1]) < lengths[:, None]] = index
+
+        states = np.ones(len(strings), dtype=np.int32)
+        for column in codes.T:  # one gather per input position, dead state 0 is absorbing
+            states = table[states, column]
+        return self._np_finals[states]
+
+
+class StreamMatcher:
+    """Resumable run of a FiniteAutomaton over input that arrives in chunks.
+
+    Uses the compiled table, so each symbol is one lookup; once the dead state
+    is reached the rest of the input is skipped.
+    """
+
+    def __init__(self, automaton):
+        self.table, self.finals, self.symbol_index, self.width = automaton.compile()
+        self.state = 1  # start state
+        self.consumed = 0  # symbols read, up to and including the one that killed the run
+
+    def feed(self, chunk):
+        """Advance over chunk; returns whether the input so far is accepted."""
+        table, index, width, unknown = self.table, self.symbol_index, self.width, self.width - 2
+        state = self.state
+        if not state:
+            return False
+        for position, symbol in enumerate(chunk):
+            state = table[state * width + index.get(symbol, unknown)]
+            if not state:
+                self.consumed += position + 1
+                break
+        else:
+            self.consumed += len(chunk)
+        self.state = state
+        return self.finals[state]
+
+    def accepting_positions(self, chunk):
+        """Advance over chunk, yielding each prefix length (counted from the start of the stream) that is accepted."""
+        table, finals, index, width, unknown = self.table, self.finals, self.symbol_index, self.width, self.width - 2
+        for symbol in chunk:
+            if not self.state:
+                return
+            self.state = table[self.state * width + index.get(symbol, unknown)]
+            self.consumed += 1
+            if finals[self.state]:
+                yield self.consumed
+
+    def feed_file(self, source, chunk_size=1 << 16, encoding="utf-8"):
+        """Feed a text file (path or open stream) in chunks, stopping once the run is dead."""
+        stream = open(source, encoding=encoding) if isinstance(source, str) else source
+        try:
+            while not self.is_dead():
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                self.feed(chunk)
+        finally:
+            if stream is not source:
+                stream.close()
+        return self.is_accepting()
+
+    def is_accepting(self):
+        return self.finals[self.state]
+
+    def is_dead(self):
+        return not self.state
+
+    def snapshot(self):
+        return self.state, self.consumed
+
+    def restore(self, snapshot):
+        self.state, self.consumed = snapshot
+
+    def reset(self):
+        self.restore((1, 0))
+
 
-# Usage
-grammar = Grammar()
-generated_strings = grammar.generate_strings()
-print("Generated Strings:", generated_strings)
+if __name__ == "__main__":
+    # Usage
+    grammar = Grammar()
+    generated_strings = grammar.generate_strings()
+    print("Generated Strings:", generated_strings)
 
-fa = FiniteAutomaton(grammar)
-test_string = "abwdvqwv"
-print(f"FA accepts '{test_string}'?", test_string in generated_strings)
+    fa = FiniteAutomaton(grammar)
+    test_string = "abwdvqwv"
+    print(f"FA accepts '{test_string}'?", test_string in generated_strings)
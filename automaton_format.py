@@ -0,0 +1,142 @@
+import mmap
+import struct
+import sys
+from array import array
+
+# File layout, all little-endian:
+#   header    magic b"LFAD", version u16, reserved u16, states u32, symbols u32, start i32, alphabet size u32
+#   alphabet  per symbol: u16 byte length + UTF-8 bytes, then zero padding to a multiple of 4
+#   table     states x symbols int32 targets, -1 for no transition
+#   finals    bitmap, bit s of byte s // 8 set for each final state
+MAGIC = b"LFAD"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIiI")
+DEAD = -1
+
+
+def save_dfa(path, symbols, table, finals, start=0):
+    """Write a dense DFA: table is a flat sequence of len(finals) x len(symbols) targets."""
+    alphabet = bytearray()
+    for symbol in symbols:
+        encoded = symbol.encode("utf-8")
+        alphabet += struct.pack("<H", len(encoded)) + encoded
+    alphabet += bytes(-len(alphabet) % 4)
+
+    targets = array("i", table)
+    states = len(finals)
+    if len(targets) != states * len(symbols):
+        raise ValueError(f"Table has {len(targets)} entries, expected {states} x {len(symbols)}")
+    if targets and not (DEAD <= min(targets) and max(targets) < states):
+        raise ValueError(f"Table targets must lie in [{DEAD}, {states}), got {min(targets)}..{max(targets)}")
+    if not 0 <= start < states:
+        raise ValueError(f"Start state {start} out of range for {states} states")
+    if sys.byteorder != "little":
+        targets.byteswap()
+
+    bitmap = bytearray((len(finals) + 7) // 8)
+    for state, final in enumerate(finals):
+        if final:
+            bitmap[state >> 3] |= 1 << (state & 7)
+
+    with open(path, "wb") as stream:
+        stream.write(HEADER.pack(MAGIC, VERSION, 0, len(finals), len(symbols), start, len(alphabet)))
+        stream.write(alphabet)
+        stream.write(targets.tobytes())
+        stream.write(bitmap)
+
+
+class MappedDFA:
+    """A DFA file opened with mmap; steps read the transition table in place, without copying it."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise ValueError(f"{path} is not an automaton file") from None
+        try:
+            self._load(path)
+        except BaseException:
+            self.close()
+            raise
+
+    def _load(self, path):
+        if len(self._map) < HEADER.size:
+            raise ValueError(f"{path} is not an automaton file")
+        magic, version, _, states, symbols, start, alphabet_size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an automaton file")
+        if version != VERSION:
+            raise ValueError(f"Unsupported automaton file version {version}")
+        expected = HEADER.size + alphabet_size + 4 * states * symbols + (states + 7) // 8
+        if len(self._map) != expected:
+            raise ValueError(f"{path} has {len(self._map)} bytes, expected {expected} (truncated or corrupt)")
+        if not 0 <= start < states:
+            raise ValueError(f"Start state {start} out of range for {states} states")
+
+        self.num_states, self.start = states, start
+        self.symbols = []
+        offset = HEADER.size
+        for _ in range(symbols):
+            if offset + 2 > HEADER.size + alphabet_size:
+                raise ValueError(f"Alphabet of {path} overruns its declared size")
+            (length,) = struct.unpack_from("<H", self._map, offset)
+            if offset + 2 + length > HEADER.size + alphabet_size:
+                raise ValueError(f"Alphabet of {path} overruns its declared size")
+            try:
+                self.symbols.append(self._map[offset + 2:offset + 2 + length].decode("utf-8"))
+            except UnicodeDecodeError:
+                raise ValueError(f"Alphabet of {path} is not valid UTF-8") from None
+            offset += 2 + length
+        self.symbol_index = {symbol: j for j, symbol in enumerate(self.symbols)}
+
+        self._view = memoryview(self._map)
+        offset = HEADER.size + alphabet_size
+        table = self._view[offset:offset + 4 * states * symbols]
+        if sys.byteorder == "little":
+            self.table = table.cast("i")
+        else:
+            self.table = array("i", table)
+            self.table.byteswap()
+        offset += 4 * states * symbols
+        self.finals = self._view[offset:offset + (states + 7) // 8]
+
+    def is_final(self, state):
+        return state != DEAD and bool(self.finals[state >> 3] >> (state & 7) & 1)
+
+    def step(self, state, symbol):
+        j = self.symbol_index.get(symbol)
+        if state == DEAD or j is None:
+            return DEAD
+        return self.table[state * len(self.symbols) + j]
+
+    def accepts(self, input_string):
+        table, index, k = self.table, self.symbol_index, len(self.symbols)
+        state = self.start
+        for symbol in input_string:
+            j = index.get(symbol)
+            if j is None:
+                return False
+            state = table[state * k + j]
+            if state == DEAD:
+                return False
+        return self.is_final(state)
+
+    def close(self):
+        for name in ("table", "finals", "_view"):
+            view = self.__dict__.pop(name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_dfa(path):
+    return MappedDFA(path)
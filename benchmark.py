@@ -0,0 +1,203 @@
+"""Scaling benchmarks for the lab modules on synthetic workloads.
+
+    python benchmark.py              # default sizes
+    python benchmark.py --quick      # small sizes, for a smoke run
+    python benchmark.py --only cnf   # one suite: to_dfa, accepts, cnf, tokenize, parse
+
+Each row reports the workload size, wall time, throughput and the peak
+traced allocation (tracemalloc) of one run.
+"""
+import argparse
+import copy
+import random
+import time
+import tracemalloc
+
+import LAB_1
+import lab2_2
+import lab5
+import lab6
+
+
+# Workload generators
+def random_nfa(states, alphabet="ab", branches=2, final_rate=0.2, seed=0):
+    """An lab2_2 NFA whose determinization grows like (states / branches) ** branches.
+
+    q0 branches on every symbol into the first state of each of branches random
+    DFAs over the remaining states, and the DFAs never meet again. Subsets
+    therefore hold at most one state per branch, so the DFA size follows N
+    instead of jumping between a handful of states and 2 ** N. A chain on the
+    first symbol makes every state reachable.
+    """
+    rng = random.Random(seed)
+    names = [f"q{i}" for i in range(states)]
+    groups = [names[1 + i::branches] for i in range(branches)]
+    transitions = {names[0]: {symbol: {group[0] for group in groups if group} for symbol in alphabet}}
+    for group in groups:
+        for i, name in enumerate(group):
+            transitions[name] = {symbol: {rng.choice(group)} for symbol in alphabet}
+            if i + 1 < len(group):
+                transitions[name][alphabet[0]] = {group[i + 1]}
+    finals = {name for name in names if rng.random() < final_rate} or {names[-1]}
+    return lab2_2.FiniteAutomaton(set(names), set(alphabet), transitions, names[0], finals)
+
+
+def random_right_linear_grammar(variables, alphabet="abc", rules_per_variable=3, seed=0):
+    """A LAB_1-style grammar object: productions 'aB' or a single terminal.
+
+    LAB_1 reads productions symbol by symbol, so non-terminals are single
+    letters, and at most 26 of them.
+    """
+    if not 0 < variables <= 26:
+        raise ValueError(f"LAB_1 grammars need 1 to 26 single-letter non-terminals, not {variables}")
+    rng = random.Random(seed)
+    grammar = LAB_1.Grammar()
+    names = [chr(ord("A") + i) for i in range(variables)]
+    grammar.VN, grammar.VT, grammar.start_symbol = set(names), set(alphabet), names[0]
+    grammar.P = {name: [rng.choice(alphabet) + rng.choice(names) if rng.random() < 0.8 else rng.choice(alphabet)
+                        for _ in range(rules_per_variable)] for name in names}
+    return grammar
+
+
+def random_cfg(rules, variables=None, terminals=("a", "b"), max_length=3, epsilon_rate=0.02, unit_rate=0.05,
+               seed=0):
+    """Arguments for lab5.CFGtoCNFConverter: a random grammar with the given number of rules."""
+    rng = random.Random(seed)
+    variables = variables or max(2, rules // 4)
+    names = [f"V{i}" for i in range(variables)]
+    productions = [(name, [rng.choice(terminals)]) for name in names]  # every variable is productive
+    while len(productions) < rules:
+        head = rng.choice(names)
+        if rng.random() < epsilon_rate:
+            productions.append((head, ['ε']))
+        elif rng.random() < unit_rate:
+            productions.append((head, [rng.choice(names)]))
+        else:
+            productions.append((head, [rng.choice(names + list(terminals)) for _ in range(rng.randint(2, max_length))]))
+    return set(names), set(terminals), productions, names[0]
+
+
+def random_expression(length, seed=0):
+    """A valid lab6 expression of about length tokens."""
+    rng = random.Random(seed)
+    parts = []
+    while len(parts) < length:
+        if parts:
+            parts.append(rng.choice("+-*/"))
+        factor = rng.choice(["{}", "{}.5", "sin({})", "cos {}", "({} + {})"])
+        parts.append(factor.format(*(rng.randint(1, 99) for _ in range(factor.count("{}")))))
+    return " ".join(parts)
+
+
+def nested_expression(depth, kind="paren"):
+    """Nesting of the given depth: ((((1)))) or sin sin ... sin 1."""
+    if kind == "paren":
+        return "(" * depth + "1" + ")" * depth
+    return "sin " * depth + "1"
+
+
+# Measurement
+def measure(function, *args):
+    """Run once for wall time, then once under tracemalloc for the peak; returns (seconds, peak bytes)."""
+    start = time.perf_counter()
+    function(*args)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def report(suite, case, size, units, seconds, peak):
+    rate = units / seconds if seconds else float("inf")
+    print(f"{suite:<9} {case:<30} {size:>9} {seconds * 1000:>10.2f} ms {rate:>14,.0f}/s {peak / 1024:>10.1f} KiB")
+
+
+# Suites
+def bench_to_dfa(scale):
+    for states in (8, 32, 128, 512)[:scale]:
+        nfa = random_nfa(states, seed=states)
+        dfa_states = len(nfa.to_dfa()[0].states)  # the real size of the work, reported beside N
+        seconds, peak = measure(nfa.to_dfa)
+        report("to_dfa", f"subset construction ({dfa_states} DFA)", states, states, seconds, peak)
+        seconds, peak = measure(nfa.minimize)
+        report("to_dfa", f"determinize+minimize ({dfa_states} DFA)", states, states, seconds, peak)
+
+
+def bench_accepts(scale):
+    grammar = random_right_linear_grammar(16)
+    fa = LAB_1.FiniteAutomaton(grammar)
+    words = grammar.sample_strings(1000, 40, rng=random.Random(1), unique=False)
+    accepted = sum(map(fa.accepts, words)) / len(words)  # near 0 would mean the words die at the first symbols
+    for copies in (1, 10, 100, 1000)[:scale]:
+        batch = words * copies
+        seconds, peak = measure(lambda: [fa.accepts(word) for word in batch])
+        report("accepts", f"accepts ({accepted:.0%} accepted)", len(batch), len(batch), seconds, peak)
+        seconds, peak = measure(fa.accepts_many, batch)
+        report("accepts", f"accepts_many ({accepted:.0%} accepted)", len(batch), len(batch), seconds, peak)
+
+
+def bench_cnf(scale):
+    steps = ["remove_epsilon_productions", "remove_unit_productions", "remove_non_productive_symbols",
+             "remove_inaccessible_symbols", "convert_to_cnf"]
+    for rules in (50, 250, 1000, 4000)[:scale]:
+        grammar = random_cfg(rules, seed=rules)
+        converter = lab5.CFGtoCNFConverter(*grammar)
+        for step in steps:
+            # each step runs on the previous step's output; measure() runs twice, so prepare two copies
+            copies = [copy.deepcopy(converter) for _ in range(2)]
+            size = converter.rule_count()
+            seconds, peak = measure(lambda: getattr(copies.pop(), step)())
+            report("cnf", step, size, size, seconds, peak)
+            getattr(converter, step)()
+        seconds, peak = measure(lambda: lab5.CFGtoCNFConverter(*grammar).convert_to_cnf_bounded())
+        report("cnf", "convert_to_cnf_bounded", rules, rules, seconds, peak)
+
+
+def bench_tokenize(scale):
+    for length in (100, 1000, 10000, 100000)[:scale]:
+        text = random_expression(length, seed=length)
+        seconds, peak = measure(lambda: lab6.Lexer(text).tokenize())
+        report("tokenize", "Lexer.tokenize", length, len(text), seconds, peak)
+        seconds, peak = measure(lambda: lab6.Lexer(text).tokenize_buffer())
+        report("tokenize", "Lexer.tokenize_buffer", length, len(text), seconds, peak)
+
+
+def bench_parse(scale):
+    for length in (100, 1000, 10000, 100000)[:scale]:
+        tokens = lab6.Lexer(random_expression(length, seed=length)).tokenize()
+        for parser in (lab6.Parser, lab6.PrecedenceParser):
+            seconds, peak = measure(lambda: parser(tokens).parse())
+            report("parse", parser.__name__, length, len(tokens), seconds, peak)
+    for depth in (10, 100, 1000, 10000)[:scale]:
+        for kind in ("paren", "sin"):
+            tokens = lab6.Lexer(nested_expression(depth, kind)).tokenize()
+            seconds, peak = measure(lambda: lab6.PrecedenceParser(tokens).parse())
+            report("parse", f"PrecedenceParser {kind}", depth, len(tokens), seconds, peak)
+
+
+SUITES = {
+    "to_dfa": bench_to_dfa,
+    "accepts": bench_accepts,
+    "cnf": bench_cnf,
+    "tokenize": bench_tokenize,
+    "parse": bench_parse,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="only the two smallest sizes")
+    parser.add_argument("--only", choices=sorted(SUITES), action="append", help="suites to run (repeatable)")
+    args = parser.parse_args(argv)
+    scale = 2 if args.quick else 4
+    print(f"{'suite':<9} {'case':<30} {'size':>9} {'time':>13} {'throughput':>16} {'peak':>14}")
+    for name in args.only or SUITES:
+        SUITES[name](scale)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # regex shards fall back to random.Random
+    np = None
+
+from LAB_1 import Grammar
+from lab4 import compile_matcher, compile_regex
+
+
+def shard_seed(seed, shard):
+    """Seed for one shard, derived from the master seed and the shard index only."""
+    digest = hashlib.sha256(f"{seed}:{shard}".encode()).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+def grammar_shard(args):
+    grammar, size, max_length, seed = args
+    return grammar.sample_strings(size, max_length, rng=random.Random(seed), unique=False)
+
+
+def regex_shard(args):
+    pattern, size, seed = args
+    if np is None:
+        return compile_regex(pattern).generate(size, random.Random(seed))
+    return compile_regex(pattern).generate(size, np.random.default_rng(seed))
+
+
+def ordered_map(function, args, workers=None, window=None):
+    """Like Executor.map, but keeps at most window tasks in flight and yields in submission order."""
+    if workers == 1:
+        yield from map(function, args)
+        return
+    workers = workers or os.cpu_count() or 1
+    window = window or 2 * workers
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            for arg in args:
+                pending.append(executor.submit(function, arg))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:  # the consumer stopped early
+                future.cancel()
+
+
+def write_corpus(output, shard_function, make_args, count, seed=0, shard_size=10000, workers=None, dedupe=False):
+    """Generate count strings shard by shard and stream them to output, one per line.
+
+    Shards are fixed units of shard_size strings, each seeded from (seed, shard index)
+    and written in index order, so the corpus does not depend on the number of workers.
+    With dedupe, strings already written are skipped and further shards are drawn
+    until count distinct strings exist. Returns the number of lines written.
+    """
+    def shard_args():
+        shard = 0
+        while True:
+            yield make_args(shard_size, shard_seed(seed, shard))
+            shard += 1
+            if not dedupe and shard * shard_size >= count:
+                return
+
+    close = isinstance(output, str)
+    stream = open(output, "w", encoding="utf-8") if close else output
+    seen = set() if dedupe else None
+    written = 0
+    try:
+        for strings in ordered_map(shard_function, shard_args(), workers):
+            lines = []
+            for string in strings:
+                if written + len(lines) >= count:
+                    break
+                if seen is not None:
+                    if string in seen:
+                        continue
+                    seen.add(string)
+                lines.append(string)
+            stream.write("".join(line + "\n" for line in lines))
+            written += len(lines)
+            if written >= count:
+                break
+    finally:
+        if close:
+            stream.close()
+    return written
+
+
+def grammar_corpus(output, count, grammar=None, max_length=10, **options):
+    """Corpus of words from a LAB_1 grammar; see write_corpus for the options."""
+    grammar = grammar if grammar is not None else Grammar()
+    if options.get("dedupe"):
+        _, counts = grammar.count_strings(max_length)
+        total = sum(counts[0])
+        if count > total:
+            raise ValueError(f"Only {total} distinct strings of length <= {max_length}, cannot generate {count}")
+    return write_corpus(output, grammar_shard, lambda size, seed: (grammar, size, max_length, seed), count, **options)
+
+
+def regex_corpus(output, pattern, count, **options):
+    """Corpus of strings from a lab4 pattern; see write_corpus for the options."""
+    if options.get("dedupe"):
+        total = sum(compile_matcher(pattern).count())
+        if count > total:
+            raise ValueError(f"Only {total} distinct strings match {pattern}, cannot generate {count}")
+    return write_corpus(output, regex_shard, lambda size, seed: (pattern, size, seed), count, **options)
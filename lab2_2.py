@@ -1,42 +1,150 @@
-import itertools
+from array import array
+from collections import deque
+
+from automaton_format import DEAD, save_dfa
+
 
 class FiniteAutomaton:
-    def __init__(self, states, alphabet, transitions, start_state, final_states):
+    def __init__(self, states, alphabet, transitions, start_state, final_states, single_targets=False):
         self.states = states
         self.alphabet = alphabet
         self.transitions = transitions
         self.start_state = start_state
         self.final_states = final_states
+        # True when transitions map a symbol to one state (as to_dfa builds them) rather than to a set of states
+        self.single_targets = single_targets
 
     def is_deterministic(self):
+        if self.single_targets:
+            return True
         for state, transitions in self.transitions.items():
             for symbol, next_states in transitions.items():
                 if len(next_states) > 1:
                     return False
         return True
 
+    def _successors(self, next_states):
+        return (next_states,) if self.single_targets else next_states
+
+    def _index_states(self):
+        names = set(self.states)
+        for state, transitions in self.transitions.items():
+            names.add(state)
+            for next_states in transitions.values():
+                names.update(self._successors(next_states))
+        names = sorted(names, key=str)
+        return names, {name: i for i, name in enumerate(names)}
+
+    @staticmethod
+    def _labels(names):
+        # subset states of an earlier to_dfa are frozensets; print them as "a,b"
+        return [",".join(sorted(map(str, name))) if isinstance(name, frozenset) else str(name) for name in names]
+
+    def _subset_construction(self):
+        """Determinize over integer state ids, with subsets stored as int bitmasks."""
+        names, index = self._index_states()
+        symbols = sorted(self.alphabet)
+
+        # successors[i][j] is the mask of states reachable from state i on symbols[j]
+        successors = [[0] * len(symbols) for _ in names]
+        for state, transitions in self.transitions.items():
+            row = successors[index[state]]
+            for j, symbol in enumerate(symbols):
+                if symbol not in transitions:
+                    continue  # DFAs from to_dfa omit missing moves instead of mapping them to an empty set
+                for next_state in self._successors(transitions[symbol]):
+                    row[j] |= 1 << index[next_state]
+
+        start = 1 << index[self.start_state]
+        subsets = [start]
+        seen = {start: 0}
+        table = []
+        queue = deque([start])
+        while queue:
+            current = queue.popleft()
+            row = [0] * len(symbols)
+            bits = current
+            while bits:
+                low = bits & -bits
+                state_row = successors[low.bit_length() - 1]
+                for j in range(len(symbols)):
+                    row[j] |= state_row[j]
+                bits ^= low
+            for j, mask in enumerate(row):
+                if not mask:
+                    row[j] = DEAD
+                    continue
+                target = seen.get(mask)
+                if target is None:
+                    target = seen[mask] = len(subsets)
+                    subsets.append(mask)
+                    queue.append(mask)
+                row[j] = target
+            table.append(row)
+
+        final_mask = 0
+        for state in self.final_states:
+            if state in index:
+                final_mask |= 1 << index[state]
+        finals = [bool(mask & final_mask) for mask in subsets]
+        return names, symbols, subsets, table, finals
+
     def to_dfa(self):
-        dfa_states = set()
+        names, symbols, subsets, table, finals = self._subset_construction()
+        dfa_states = [frozenset(names[i] for i in range(len(names)) if mask >> i & 1) for mask in subsets]
+        labels = self._labels(names)
+        state_map = {state: "{" + ",".join(labels[i] for i in range(len(names)) if mask >> i & 1) + "}"
+                     for state, mask in zip(dfa_states, subsets)}
+
         dfa_transitions = {}
-        state_map = {}
+        for state, row in zip(dfa_states, table):
+            dfa_transitions[state] = {symbol: dfa_states[target] for symbol, target in zip(symbols, row) if target >= 0}
 
-        queue = [frozenset([self.start_state])]
-        while queue:
-            current = queue.pop(0)
-            dfa_states.add(current)
-            state_map[current] = "{" + ",".join(current) + "}"
-
-            transitions = {}
-            for symbol in self.alphabet:
-                next_state = frozenset(itertools.chain.from_iterable(self.transitions.get(state, {}).get(symbol, []) for state in current))
-                if next_state:
-                    transitions[symbol] = next_state
-                    if next_state not in dfa_states and next_state not in queue:
-                        queue.append(next_state)
-            dfa_transitions[current] = transitions
-
-        dfa_final_states = {state for state in dfa_states if any(s in self.final_states for s in state)}
-        return FiniteAutomaton(dfa_states, self.alphabet, dfa_transitions, frozenset([self.start_state]), dfa_final_states), state_map
+        dfa_final_states = {state for state, final in zip(dfa_states, finals) if final}
+        return FiniteAutomaton(set(dfa_states), self.alphabet, dfa_transitions, dfa_states[0], dfa_final_states,
+                               single_targets=True), state_map
+
+    def to_dense(self):
+        """Determinize into a DenseDFA; labels[i] is the subset name of dense state i."""
+        names, symbols, subsets, table, finals = self._subset_construction()
+        names = self._labels(names)
+        labels = ["{" + ",".join(names[i] for i in range(len(names)) if mask >> i & 1) + "}" for mask in subsets]
+        return DenseDFA(symbols, [target for row in table for target in row], finals, labels)
+
+    def minimize(self):
+        """Determinize and minimize with Hopcroft's algorithm; returns (dfa, state_map) like to_dfa."""
+        dense = self.to_dense()
+        block_of = dense._hopcroft()
+
+        members = {}
+        for state, block in enumerate(block_of):
+            if block != DEAD:
+                members.setdefault(block, []).append(dense.labels[state])
+        min_states = {block: frozenset(labels) for block, labels in members.items()}
+        state_map = {state: "|".join(sorted(state)) for state in min_states.values()}
+
+        k = len(dense.symbols)
+        min_transitions = {}
+        for state, block in enumerate(block_of):
+            if block == DEAD or min_states[block] in min_transitions:
+                continue
+            row = dense.table[state * k:(state + 1) * k]
+            min_transitions[min_states[block]] = {symbol: min_states[block_of[target]]
+                                                  for symbol, target in zip(dense.symbols, row)
+                                                  if target != DEAD and block_of[target] != DEAD}
+
+        min_finals = {min_states[block_of[state]] for state in range(dense.num_states)
+                      if dense.finals[state] and block_of[state] != DEAD}
+        if block_of[dense.start] == DEAD:
+            # empty language: keep a single non-final start state
+            start = frozenset(["{}"])
+            min_states[DEAD] = start
+            min_transitions[start] = {}
+            state_map[start] = "{}"
+        else:
+            start = min_states[block_of[dense.start]]
+        return FiniteAutomaton(set(min_states.values()), self.alphabet, min_transitions, start, min_finals,
+                               single_targets=True), state_map
 
     def print_as_regular_grammar(self):
         print("Regular Grammar:")
@@ -59,6 +167,244 @@ class FiniteAutomaton:
             for symbol, next_state in transitions.items():
                 print(f"{state_map[state]}--{symbol}-->{state_map[next_state]}")
 
+class DenseDFA:
+    """DFA stored as a flat array('i') table of num_states x len(symbols) targets, DEAD for no move."""
+
+    def __init__(self, symbols, table, finals, labels=None, start=0):
+        self.symbols = list(symbols)
+        self.symbol_index = {symbol: j for j, symbol in enumerate(self.symbols)}
+        self.table = array('i', table)
+        self.finals = bytearray(finals)
+        self.num_states = len(self.finals)
+        self.labels = labels if labels is not None else [str(i) for i in range(self.num_states)]
+        self.start = start
+
+    def step(self, state, symbol):
+        j = self.symbol_index.get(symbol)
+        if state == DEAD or j is None:
+            return DEAD
+        return self.table[state * len(self.symbols) + j]
+
+    def accepts(self, input_string):
+        table, index, k = self.table, self.symbol_index, len(self.symbols)
+        state = self.start
+        for symbol in input_string:
+            j = index.get(symbol)
+            if j is None:
+                return False
+            state = table[state * k + j]
+            if state == DEAD:
+                return False
+        return bool(self.finals[state])
+
+    def save(self, path):
+        """Write the table in the binary format of automaton_format; load it back with load_dfa."""
+        save_dfa(path, self.symbols, self.table, self.finals, self.start)
+
+    def _hopcroft(self):
+        """Partition refinement; returns the block of each state, DEAD for states equivalent to the dead state."""
+        n, k = self.num_states, len(self.symbols)
+        dead = n  # complete the automaton with an explicit sink
+        inverse = [[[] for _ in range(n + 1)] for _ in range(k)]
+        for state in range(n):
+            for j in range(k):
+                target = self.table[state * k + j]
+                inverse[j][dead if target == DEAD else target].append(state)
+        for j in range(k):
+            inverse[j][dead].append(dead)
+
+        finals = {state for state in range(n) if self.finals[state]}
+        others = set(range(n + 1)) - finals
+        blocks = [block for block in (finals, others) if block]
+        block_of = [0] * (n + 1)
+        for b, block in enumerate(blocks):
+            for state in block:
+                block_of[state] = b
+
+        pending = set()
+        if len(blocks) == 2:
+            smaller = 0 if len(blocks[0]) <= len(blocks[1]) else 1
+            pending = {(smaller, j) for j in range(k)}
+        worklist = list(pending)
+        while worklist:
+            splitter = worklist.pop()
+            pending.discard(splitter)
+            b, j = splitter
+            touched = {}
+            for state in blocks[b]:
+                for source in inverse[j][state]:
+                    touched.setdefault(block_of[source], set()).add(source)
+            for y, inside in touched.items():
+                if len(inside) == len(blocks[y]):
+                    continue
+                blocks[y] -= inside
+                z = len(blocks)
+                blocks.append(inside)
+                for state in inside:
+                    block_of[state] = z
+                for c in range(k):
+                    if (y, c) in pending:
+                        add = (z, c)
+                    else:
+                        add = (z, c) if len(inside) <= len(blocks[y]) else (y, c)
+                    pending.add(add)
+                    worklist.append(add)
+
+        # number blocks in BFS order from the start state so the result is deterministic
+        dead_block = block_of[dead]
+        order = {}
+        queue = deque([self.start])
+        seen = {self.start}
+        while queue:
+            state = queue.popleft()
+            if block_of[state] != dead_block and block_of[state] not in order:
+                order[block_of[state]] = len(order)
+            for j in range(k):
+                target = self.table[state * k + j]
+                if target != DEAD and target not in seen:
+                    seen.add(target)
+                    queue.append(target)
+        return [order.get(block_of[state], DEAD) for state in range(n)]
+
+    def minimize(self):
+        block_of = self._hopcroft()
+        k = len(self.symbols)
+        size = max(block_of, default=DEAD) + 1
+        table = [DEAD] * (size * k)
+        finals = [False] * size
+        labels = [[] for _ in range(size)]
+        for state, block in enumerate(block_of):
+            if block == DEAD:
+                continue
+            labels[block].append(self.labels[state])
+            finals[block] = bool(self.finals[state])
+            for j in range(k):
+                target = self.table[state * k + j]
+                table[block * k + j] = DEAD if target == DEAD else block_of[target]
+        if size == 0:
+            # empty language: a lone non-final start state
+            return DenseDFA(self.symbols, [DEAD] * k, [False], ["{}"])
+        return DenseDFA(self.symbols, table, finals, ["|".join(sorted(group)) for group in labels], block_of[self.start])
+
+
+def as_dense(automaton):
+    return automaton if isinstance(automaton, DenseDFA) else automaton.to_dense()
+
+
+class ProductDFA:
+    """Product of two DFAs whose states are (left, right) pairs, created only when reached.
+
+    accepting decides a pair from the two operands' acceptance, which gives
+    intersection, union and difference.
+    """
+
+    def __init__(self, left, right, accepting):
+        self.left, self.right = as_dense(left), as_dense(right)
+        self.accepting = accepting
+        self.symbols = sorted(set(self.left.symbols) | set(self.right.symbols))
+        self.start = (self.left.start, self.right.start)
+
+    def step(self, state, symbol):
+        return self.left.step(state[0], symbol), self.right.step(state[1], symbol)
+
+    def is_final(self, state):
+        left, right = state
+        return self.accepting(left != DEAD and bool(self.left.finals[left]),
+                              right != DEAD and bool(self.right.finals[right]))
+
+    def accepts(self, input_string):
+        state = self.start
+        for symbol in input_string:
+            state = self.step(state, symbol)
+        return self.is_final(state)
+
+    def explore(self):
+        """Breadth-first over reachable pairs; yields (state, shortest word reaching it)."""
+        previous = {self.start: None}
+        queue = deque([self.start])
+        while queue:
+            state = queue.popleft()
+            yield state, self._word(previous, state)
+            for symbol in self.symbols:
+                target = self.step(state, symbol)
+                if target != (DEAD, DEAD) and target not in previous:
+                    previous[target] = (state, symbol)
+                    queue.append(target)
+
+    @staticmethod
+    def _word(previous, state):
+        symbols = []
+        while previous[state] is not None:
+            state, symbol = previous[state]
+            symbols.append(symbol)
+        return "".join(reversed(symbols))
+
+    def find_word(self):
+        """Shortest accepted word, or None if the language is empty; stops at the first one found."""
+        for state, word in self.explore():
+            if self.is_final(state):
+                return word
+        return None
+
+    def to_dense(self):
+        ids = {}
+        for state, _ in self.explore():
+            ids[state] = len(ids)
+        table = [ids.get(self.step(state, symbol), DEAD) for state in ids for symbol in self.symbols]
+        labels = [f"({self.left.labels[l] if l != DEAD else '-'},{self.right.labels[r] if r != DEAD else '-'})"
+                  for l, r in ids]
+        return DenseDFA(self.symbols, table, [self.is_final(state) for state in ids], labels)
+
+
+def intersection(a, b):
+    return ProductDFA(a, b, lambda left, right: left and right)
+
+
+def union(a, b):
+    return ProductDFA(a, b, lambda left, right: left or right)
+
+
+def difference(a, b):
+    return ProductDFA(a, b, lambda left, right: left and not right)
+
+
+def equivalent(a, b):
+    """Hopcroft-Karp check: None if a and b accept the same language, else a word only one accepts.
+
+    Pairs of states are merged with union-find as they are assumed equal, so
+    at most |a| + |b| pairs are expanded before the answer is known.
+    """
+    a, b = as_dense(a), as_dense(b)
+    symbols = sorted(set(a.symbols) | set(b.symbols))
+    parent = {}
+
+    def find(node):
+        root = node
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while node != root:
+            parent[node], node = root, parent.get(node, node)
+        return root
+
+    start = (a.start, b.start)
+    previous = {start: None}
+    parent[("a", a.start)] = ("b", b.start)
+    queue = deque([start])
+    while queue:
+        pair = queue.popleft()
+        p, q = pair
+        if (p != DEAD and bool(a.finals[p])) != (q != DEAD and bool(b.finals[q])):
+            return ProductDFA._word(previous, pair)
+        for symbol in symbols:
+            target = (a.step(p, symbol), b.step(q, symbol))
+            left, right = find(("a", target[0])), find(("b", target[1]))
+            if left != right:
+                parent[left] = right
+                previous[target] = (pair, symbol)
+                queue.append(target)
+    return None
+
+
 # Variant 22
 states = {"q0", "q1", "q2"}
 alphabet = {"a", "b"}
@@ -70,13 +416,23 @@ transitions = {
 start_state = "q0"
 final_states = {"q2"}
 
-nfa = FiniteAutomaton(states, alphabet, transitions, start_state, final_states)
-nfa.print_as_regular_grammar()
+if __name__ == "__main__":
+    nfa = FiniteAutomaton(states, alphabet, transitions, start_state, final_states)
+    nfa.print_as_regular_grammar()
+
+    if nfa.is_deterministic():
+        print("Finite Automaton is deterministic")
+    else:
+        print("Finite Automaton is non-deterministic")
+
+    dfa, state_map = nfa.to_dfa()
+    dfa.print_as_fa(state_map)
 
-if nfa.is_deterministic():
-    print("Finite Automaton is deterministic")
-else:
-    print("Finite Automaton is non-deterministic")
+    min_dfa, min_state_map = nfa.minimize()
+    min_dfa.print_as_fa(min_state_map)
+    print("DFA equivalent to NFA?", equivalent(nfa, dfa) is None)
 
-dfa, state_map = nfa.to_dfa()
-dfa.print_as_fa(state_map)
+    # re-determinizing a DFA with missing moves must give back the same language
+    partial = FiniteAutomaton({'p', 'q'}, {'a', 'b'}, {'p': {'a': {'q'}}}, 'p', {'q'}).to_dfa()[0]
+    assert equivalent(partial, partial.to_dfa()[0]) is None and equivalent(partial, partial.minimize()[0]) is None
+    assert equivalent(nfa, min_dfa.to_dfa()[0]) is None
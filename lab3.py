@@ -1,5 +1,7 @@
+import codecs
 import re
 import math
+from array import array
 
 # Token types
 TOKEN_TYPES = {
@@ -15,6 +17,10 @@ TOKEN_TYPES = {
 }
 
 TOKEN_REGEX = '|'.join(f'(?P<{name}>{pattern})' for name, pattern in TOKEN_TYPES.items())
+# Same alternation, but every character is covered by some match so chunks can be cut anywhere
+STREAM_REGEX = re.compile(TOKEN_REGEX + r'|(?P<SKIP>\s+)|(?P<MISMATCH>.)', re.DOTALL)
+# A match is final once this many characters follow it in the buffer ("12." may still become "12.5")
+LOOKAHEAD = 2
 
 class Token:
     def __init__(self, type, value):
@@ -25,6 +31,38 @@ class Token:
         return f"Token({self.type}, {self.value})\n"
         
 
+TOKEN_NAMES = list(TOKEN_TYPES)
+TOKEN_CODES = {name: code for code, name in enumerate(TOKEN_NAMES)}
+
+
+class TokenBuffer:
+    """Compact token stream over the source text; numbers are only converted when read."""
+
+    def __init__(self, text):
+        self.text = text
+        self.types = array('B')
+        self.starts = array('Q')
+        self.ends = array('Q')
+
+    def __len__(self):
+        return len(self.types)
+
+    def type_at(self, index):
+        return TOKEN_NAMES[self.types[index]]
+
+    def value_at(self, index):
+        value = self.text[self.starts[index]:self.ends[index]]
+        if self.types[index] == TOKEN_CODES['NUMBER']:
+            value = float(value) if '.' in value else int(value)
+        return value
+
+    def __getitem__(self, index):
+        return Token(self.type_at(index), self.value_at(index))
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+
 class Lexer:
     def __init__(self, text):
         self.text = text
@@ -32,13 +70,73 @@ class Lexer:
     
     def tokenize(self):
         for match in re.finditer(TOKEN_REGEX, self.text):
-            token_type = match.lastgroup
-            value = match.group()
-            if token_type == 'NUMBER':
-                value = float(value) if '.' in value else int(value)
-            self.tokens.append(Token(token_type, value))
+            self.tokens.append(make_token(match))
         return self.tokens
 
+    def tokenize_buffer(self):
+        buffer = TokenBuffer(self.text)
+        for match in re.finditer(TOKEN_REGEX, self.text):
+            buffer.types.append(TOKEN_CODES[match.lastgroup])
+            buffer.starts.append(match.start())
+            buffer.ends.append(match.end())
+        return buffer
+
+
+def make_token(match):
+    token_type = match.lastgroup
+    value = match.group()
+    if token_type == 'NUMBER':
+        value = float(value) if '.' in value else int(value)
+    return Token(token_type, value)
+
+
+def read_chunks(source, chunk_size):
+    """Yield text chunks from a str, a text or binary file object, or an mmap."""
+    if isinstance(source, str):
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start + chunk_size]
+        return
+    decoder = None
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        if not isinstance(chunk, str):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder('utf-8')()
+            chunk = decoder.decode(chunk)
+        yield chunk
+    if decoder is not None:
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+
+def iter_tokens(source, chunk_size=1 << 16, strict=False):
+    """Lazily tokenize source chunk by chunk; strict=True raises on unrecognized characters."""
+    buffer = ''
+    for chunk in read_chunks(source, chunk_size):
+        buffer += chunk
+        limit = len(buffer) - LOOKAHEAD
+        pos = 0
+        for match in STREAM_REGEX.finditer(buffer):
+            if match.end() > limit and match.lastgroup != 'SKIP':
+                break  # may still grow with the next chunk; whitespace never joins a token, so drop it now
+            pos = match.end()
+            yield from _emit(match, strict)
+        buffer = buffer[pos:]
+    for match in STREAM_REGEX.finditer(buffer):
+        yield from _emit(match, strict)
+
+
+def _emit(match, strict):
+    kind = match.lastgroup
+    if kind == 'MISMATCH':
+        if strict:
+            raise ValueError(f"Unexpected character: {match.group()}")
+    elif kind != 'SKIP':
+        yield make_token(match)
+
 if __name__ == "__main__":
     expression = "sin(30) + cos(60) - 5.5 * 2 + 10 / 2"
     lexer = Lexer(expression)
@@ -1,4 +1,10 @@
 import random
+from itertools import repeat
+
+try:
+    import numpy as np
+except ImportError:  # CompiledRegex falls back to generate_from_parsed
+    np = None
 
 def parse_regex(pattern):
     """Parse the regex into a structured format."""
@@ -49,19 +55,19 @@ def parse_regex(pattern):
         i += 1
     return parsed
 
-def generate_from_parsed(parsed):
+def generate_from_parsed(parsed, rng=random):
     """Generate a string from the parsed regex structure."""
     result = []
     for token in parsed:
         if token[0] == 'char':
             result.append(token[1])
         elif token[0] == 'group':
-            result.append(random.choice(token[1]))
+            result.append(rng.choice(token[1]))
         elif token[0] == 'repeat':
             _, sub_token, min_count, max_count = token
-            count = random.randint(min_count, max_count)
+            count = rng.randint(min_count, max_count)
             for _ in range(count):
-                result.append(generate_from_parsed([sub_token]))
+                result.append(generate_from_parsed([sub_token], rng))
     return ''.join(result)
 
 def generate_from_regex(pattern, num_samples=10):
@@ -69,6 +75,265 @@ def generate_from_regex(pattern, num_samples=10):
     parsed = parse_regex(pattern)
     return [generate_from_parsed(parsed) for _ in range(num_samples)]
 
+class CompiledRegex:
+    """Reusable generator for parse_regex output that samples many strings per call.
+
+    The parsed structure is walked once into a tree of batch samplers; each
+    sampler draws its choices and repeat counts for every sample in one
+    vectorized NumPy call and returns a column of strings.
+    """
+
+    def __init__(self, parsed):
+        self.parsed = parsed
+        self.samplers = [self._compile(token) for token in parsed] if np is not None else None
+
+    def _compile(self, token):
+        if token[0] == 'char':
+            return token[1]  # constant columns stay plain strings
+        if token[0] == 'group':
+            options = np.array(token[1], dtype=object)
+            if len(options) == 1:
+                return token[1][0]
+            return lambda rng, n: options[rng.integers(0, len(options), size=n)]
+
+        _, sub_token, min_count, max_count = token
+        sub = self._compile(sub_token)
+
+        def sample_repeat(rng, n):
+            counts = rng.integers(min_count, max_count + 1, size=n)
+            if isinstance(sub, str):
+                return np.full(n, sub, dtype=object) * counts
+            parts = sub(rng, int(counts.sum())).tolist()
+            ends = np.cumsum(counts).tolist()
+            result = np.empty(n, dtype=object)
+            start = 0
+            for i, end in enumerate(ends):
+                result[i] = ''.join(parts[start:end])
+                start = end
+            return result
+
+        if max_count == 0:
+            return ''
+        return sample_repeat
+
+    def generate(self, num_samples=10, rng=None):
+        """rng is a NumPy Generator, or a random.Random when NumPy is missing; None means a fresh one."""
+        if self.samplers is None:
+            return [generate_from_parsed(self.parsed, rng or random) for _ in range(num_samples)]
+        if rng is None:
+            rng = np.random.default_rng()
+        columns = [repeat(sampler, num_samples) if isinstance(sampler, str) else sampler(rng, num_samples)
+                   for sampler in self.samplers]
+        return [''.join(parts) for parts in zip(*columns)] if columns else [''] * num_samples
+
+
+def compile_regex(pattern):
+    return CompiledRegex(parse_regex(pattern))
+
+
+class RegexMatcher:
+    """Full-match test for the parse_regex dialect: a Thompson NFA run through a lazily built DFA.
+
+    DFA states are created on demand from sets of NFA states and cached with
+    their transitions; when the cache reaches max_states it is flushed, so
+    memory stays bounded while each string is still scanned once, without
+    backtracking.
+    """
+
+    def __init__(self, parsed, max_states=4096):
+        self.parsed = parsed
+        self.char_edges = []  # NFA state -> {char: [targets]}
+        self.epsilon = []  # NFA state -> [targets]
+        self.start, self.accept = self._build_sequence(parsed)
+        self.max_states = max_states
+        self.flushes = 0
+        self._reset_cache()
+
+    def _new_state(self):
+        self.char_edges.append({})
+        self.epsilon.append([])
+        return len(self.epsilon) - 1
+
+    def _build_text(self, text):
+        start = current = self._new_state()
+        for char in text:
+            target = self._new_state()
+            self.char_edges[current].setdefault(char, []).append(target)
+            current = target
+        return start, current
+
+    def _build_sequence(self, tokens):
+        start = current = self._new_state()
+        for token in tokens:
+            first, last = self._build(token)
+            self.epsilon[current].append(first)
+            current = last
+        return start, current
+
+    def _build(self, token):
+        if token[0] == 'char':
+            return self._build_text(token[1])
+        if token[0] == 'group':
+            start, end = self._new_state(), self._new_state()
+            for option in token[1]:
+                first, last = self._build_text(option)
+                self.epsilon[start].append(first)
+                self.epsilon[last].append(end)
+            return start, end
+
+        _, sub_token, min_count, max_count = token
+        start = current = self._new_state()
+        for _ in range(min_count):
+            first, last = self._build(sub_token)
+            self.epsilon[current].append(first)
+            current = last
+        end = self._new_state()
+        for _ in range(max_count - min_count):
+            # each optional copy may only follow the one before it
+            first, last = self._build(sub_token)
+            self.epsilon[current].extend((end, first))
+            current = last
+        self.epsilon[current].append(end)
+        return start, end
+
+    def _closure(self, states):
+        closed = set(states)
+        stack = list(states)
+        while stack:
+            for target in self.epsilon[stack.pop()]:
+                if target not in closed:
+                    closed.add(target)
+                    stack.append(target)
+        return frozenset(closed)
+
+    def _reset_cache(self):
+        self.dfa_ids = {}
+        self.dfa_sets = []
+        self.dfa_moves = []
+        self.dfa_accepting = []
+        self.dead = self._intern(frozenset())
+        self.initial = self._intern(self._closure([self.start]))
+
+    def _intern(self, states):
+        state_id = self.dfa_ids.get(states)
+        if state_id is None:
+            state_id = self.dfa_ids[states] = len(self.dfa_sets)
+            self.dfa_sets.append(states)
+            self.dfa_moves.append({})
+            self.dfa_accepting.append(self.accept in states)
+        return state_id
+
+    def _step(self, state_id, char):
+        states = self.dfa_sets[state_id]
+        targets = [target for state in states for target in self.char_edges[state].get(char, ())]
+        closed = self._closure(targets)
+        if closed not in self.dfa_ids and len(self.dfa_sets) >= self.max_states:
+            self.flushes += 1
+            self._reset_cache()
+            return self._intern(closed)  # only the new state survives the flush
+        target_id = self._intern(closed)
+        self.dfa_moves[state_id][char] = target_id
+        return target_id
+
+    def match(self, string):
+        state = self.initial
+        for char in string:
+            target = self.dfa_moves[state].get(char)
+            state = self._step(state, char) if target is None else target
+            if state == self.dead:
+                return False
+        return self.dfa_accepting[state]
+
+    def determinize(self):
+        """Full subset construction: (moves, accepting) with state 0 the start and no dead state.
+
+        All repeats in the dialect are bounded, so the DFA is finite and acyclic.
+        """
+        start = self._closure([self.start])
+        ids = {start: 0}
+        sets = [start]
+        moves = []
+        for states in sets:  # grows while iterating
+            targets = {}
+            for state in states:
+                for char, char_targets in self.char_edges[state].items():
+                    targets.setdefault(char, set()).update(char_targets)
+            row = {}
+            for char in sorted(targets):
+                closed = self._closure(targets[char])
+                if closed not in ids:
+                    ids[closed] = len(sets)
+                    sets.append(closed)
+                row[char] = ids[closed]
+            moves.append(row)
+        return moves, [self.accept in states for states in sets]
+
+    def count(self):
+        """Exact number of distinct matching strings of each length (index = length)."""
+        return self._count(*self.determinize())
+
+    @staticmethod
+    def _count(moves, accepting):
+        counts = []
+        layer = {0: 1}
+        while layer:
+            counts.append(sum(paths for state, paths in layer.items() if accepting[state]))
+            next_layer = {}
+            for state, paths in layer.items():
+                for target in moves[state].values():
+                    next_layer[target] = next_layer.get(target, 0) + paths
+            layer = next_layer
+        while counts and not counts[-1]:
+            counts.pop()
+        return counts
+
+    def enumerate(self):
+        """Lazily yield every matching string exactly once, in shortlex order.
+
+        The DFA makes each string a single path, so no seen-set is needed; a
+        table of which states can still accept in exactly r more characters
+        prunes the depth-first walk over each length.
+        """
+        moves, accepting = self.determinize()
+        counts = self._count(moves, accepting)
+        completes = [accepting]  # completes[r][state]: some accepted suffix of length r
+        for _ in range(len(counts) - 1):
+            previous = completes[-1]
+            completes.append([any(previous[target] for target in row.values()) for row in moves])
+
+        for length, total in enumerate(counts):
+            if not total:
+                continue
+            if length == 0:
+                yield ''
+                continue
+            prefix = []
+            stack = [(0, iter(moves[0].items()))]
+            while stack:
+                for char, target in stack[-1][1]:
+                    if completes[length - len(prefix) - 1][target]:
+                        prefix.append(char)
+                        if len(prefix) == length:
+                            yield ''.join(prefix)
+                            prefix.pop()
+                        else:
+                            stack.append((target, iter(moves[target].items())))
+                        break
+                else:
+                    stack.pop()
+                    if prefix:
+                        prefix.pop()
+
+    def match_many(self, strings):
+        """Lazily yield match(string) for each string of an iterable."""
+        for string in strings:
+            yield self.match(string)
+
+
+def compile_matcher(pattern, max_states=4096):
+    return RegexMatcher(parse_regex(pattern), max_states)
+
+
 # Variant 1
 regexes = [
     "(a|b)(c|d)E^+G?", 
@@ -76,8 +341,9 @@ regexes = [
     "1(0|1)^*2(3|4)^5 36"  
 ]
 
-# Generate valid strings
-for regex in regexes:
-    print(f"Regex: {regex}")
-    print(generate_from_regex(regex))
-    print("-")
\ No newline at end of file
+if __name__ == "__main__":
+    # Generate valid strings
+    for regex in regexes:
+        print(f"Regex: {regex}")
+        print(generate_from_regex(regex))
+        print("-")
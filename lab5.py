@@ -1,14 +1,79 @@
+import functools
+import json
+import time
+import tracemalloc
 from collections import defaultdict, deque
 
+
+def stage(method):
+    """Mark a grammar transformation; with hooks registered, report its cost and the grammar size after it."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.hooks:
+            return method(self, *args, **kwargs)
+        return self._run_stage(method, args, kwargs)
+    return wrapper
+
+
+class JsonLinesHook:
+    """Stage hook that writes each record as one JSON line to a text stream."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __call__(self, record):
+        self.stream.write(json.dumps(record) + "\n")
+
+
 class CFGtoCNFConverter:
     def __init__(self, variables, terminals, productions, start_symbol):
         self.variables = set(variables)
         self.terminals = set(terminals)
-        self.productions = defaultdict(list)
+        # each variable maps to an insertion-ordered set of rules: dict keys, values unused
+        self.productions = defaultdict(dict)
         for left, right in productions:
-            self.productions[left].append(right)
+            self.productions[left][tuple(right)] = None
         self.start_symbol = start_symbol
         self.new_symbol_index = 1
+        self.hooks = []
+        self._depth = 0
+
+    def add_hook(self, hook):
+        """Call hook(record) after every stage; see _run_stage for the record fields."""
+        self.hooks.append(hook)
+
+    def grammar_size(self):
+        """(variables, rules, longest right-hand side)"""
+        longest = max((len(rule) for rules in self.productions.values() for rule in rules), default=0)
+        return len(self.variables), self.rule_count(), longest
+
+    def _run_stage(self, method, args, kwargs):
+        # allocations are only counted while tracemalloc is tracing, otherwise they are None
+        variables, rules, longest = self.grammar_size()
+        tracing = tracemalloc.is_tracing()
+        allocated = tracemalloc.get_traced_memory()[0] if tracing else None
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            result = method(self, *args, **kwargs)
+        finally:
+            self._depth -= 1
+        seconds = time.perf_counter() - start
+        if tracing:
+            allocated = tracemalloc.get_traced_memory()[0] - allocated
+        record = {
+            "stage": method.__name__,
+            "depth": self._depth,
+            "seconds": seconds,
+            "allocated_bytes": allocated,
+            "variables_before": variables,
+            "rules_before": rules,
+            "max_rule_length_before": longest,
+        }
+        record["variables"], record["rules"], record["max_rule_length"] = self.grammar_size()
+        for hook in self.hooks:
+            hook(record)
+        return result
 
     def _get_new_variable(self):
         while True:
@@ -31,91 +96,134 @@ class CFGtoCNFConverter:
                 print(f"  {A} -> {rhs}")
         print("}")
 
-    def remove_epsilon_productions(self):
-        nullable = set()
+    def _closure(self, given):
+        """Variables with a rule whose symbols are all in given or already in the closure.
+
+        Counter-based worklist: each rule counts its symbols not yet known, and a
+        reverse index from symbol to rules decrements those counters, so the whole
+        grammar is scanned O(1) times.
+        """
+        heads = []
+        pending = []
+        occurrences = defaultdict(list)
+        marked = set()
+        queue = deque()
         for A in self.productions:
             for rule in self.productions[A]:
-                if rule == ['ε']:
-                    nullable.add(A)
-
-        changed = True
-        while changed:
-            changed = False
-            for A in self.productions:
-                for rule in self.productions[A]:
-                    if all(symbol in nullable for symbol in rule) and A not in nullable:
-                        nullable.add(A)
-                        changed = True
-
-        new_productions = defaultdict(list)
+                index = len(heads)
+                heads.append(A)
+                count = 0
+                for symbol in rule:
+                    if symbol not in given:
+                        count += 1
+                        occurrences[symbol].append(index)
+                pending.append(count)
+                if count == 0 and A not in marked:
+                    marked.add(A)
+                    queue.append(A)
+
+        while queue:
+            symbol = queue.popleft()
+            for index in occurrences[symbol]:
+                pending[index] -= 1
+                if pending[index] == 0 and heads[index] not in marked:
+                    marked.add(heads[index])
+                    queue.append(heads[index])
+        return marked
+
+    @stage
+    def remove_epsilon_productions(self):
+        """DEL: drop ε rules, adding the variants that omit nullable symbols.
+
+        If the start symbol is nullable it keeps a single S -> ε rule, so the
+        language keeps the empty word; after START that S never occurs on a
+        right-hand side, as CNF requires.
+        """
+        nullable = self._closure({'ε'})
+
+        new_productions = defaultdict(dict)
         for A in self.productions:
             for rule in self.productions[A]:
-                subsets = [[]]
+                subsets = [()]
                 for symbol in rule:
+                    if symbol == 'ε':
+                        continue  # A -> ε itself only yields the empty rule, which is dropped
                     new_subsets = []
                     for s in subsets:
                         if symbol in nullable:
-                            new_subsets.append(s + [symbol])
+                            new_subsets.append(s + (symbol,))
                             new_subsets.append(s)
                         else:
-                            new_subsets.append(s + [symbol])
+                            new_subsets.append(s + (symbol,))
                     subsets = new_subsets
                 for s in subsets:
-                    if s and s not in new_productions[A]:
-                        new_productions[A].append(s)
+                    if s:
+                        new_productions[A][s] = None
+        if self.start_symbol in nullable:
+            new_productions[self.start_symbol][('ε',)] = None
         self.productions = new_productions
 
+    @stage
     def remove_unit_productions(self):
-        new_productions = defaultdict(list)
+        new_productions = defaultdict(dict)
         for A in self.productions:
             queue = deque([A])
             visited = set()
             while queue:
                 B = queue.popleft()
-                for rule in self.productions[B]:
+                for rule in self.productions.get(B, ()):
                     if len(rule) == 1 and rule[0] in self.variables:
                         if rule[0] not in visited:
                             queue.append(rule[0])
                             visited.add(rule[0])
-                    else:
-                        if rule not in new_productions[A]:
-                            new_productions[A].append(rule)
+                    elif B == A or rule != ('ε',):  # DEL already covered A deriving ε through B
+                        new_productions[A][rule] = None
         self.productions = new_productions
 
+    @stage
     def remove_non_productive_symbols(self):
-        productive = set()
-        changed = True
-        while changed:
-            changed = False
-            for A in self.productions:
-                for rule in self.productions[A]:
-                    if all(symbol in self.terminals or symbol in productive for symbol in rule):
-                        if A not in productive:
-                            productive.add(A)
-                            changed = True
-
-        self.productions = {A: [r for r in self.productions[A] if all(s in productive or s in self.terminals for s in r)]
-                            for A in productive}
+        productive = self._closure(self.terminals | {'ε'})
+
+        self.productions = {A: {r: None for r in self.productions[A]
+                                if all(s in productive or s in self.terminals or s == 'ε' for s in r)}
+                            for A in self.productions if A in productive}
         self.variables = productive
 
+    @stage
     def remove_inaccessible_symbols(self):
-        accessible = set()
+        accessible = {self.start_symbol}
         queue = deque([self.start_symbol])
         while queue:
             A = queue.popleft()
-            if A not in accessible:
-                accessible.add(A)
-                for rule in self.productions.get(A, []):
-                    for symbol in rule:
-                        if symbol in self.variables and symbol not in accessible:
-                            queue.append(symbol)
-        self.productions = {A: self.productions[A] for A in accessible}
+            for rule in self.productions.get(A, []):
+                for symbol in rule:
+                    if symbol in self.variables and symbol not in accessible:
+                        accessible.add(symbol)
+                        queue.append(symbol)
+        self.productions = {A: self.productions[A] for A in self.productions if A in accessible}
         self.variables = accessible
 
+    def rule_count(self):
+        return sum(len(rules) for rules in self.productions.values())
+
+    @stage
+    def add_start_symbol(self):
+        """START: a fresh start variable, so the start symbol never appears on a right-hand side."""
+        new_start = self._get_new_variable()
+        self.productions[new_start] = {(self.start_symbol,): None}
+        self.start_symbol = new_start
+
+    @stage
     def convert_to_cnf(self):
+        self.replace_terminals()
+        self.binarize()
+
+    @stage
+    def replace_terminals(self):
+        """TERM: terminals inside rules of length >= 2 go through a fresh variable X -> a."""
         terminal_map = {}
         for A in list(self.productions):
-            new_rules = []
+            new_rules = {}
             for rule in self.productions[A]:
                 new_rule = []
                 for symbol in rule:
@@ -123,24 +231,156 @@ class CFGtoCNFConverter:
                         if symbol not in terminal_map:
                             new_var = self._get_new_variable()
                             terminal_map[symbol] = new_var
-                            self.productions[new_var] = [[symbol]]
+                            self.productions[new_var] = {(symbol,): None}
                         new_rule.append(terminal_map[symbol])
                     else:
                         new_rule.append(symbol)
-                new_rules.append(new_rule)
+                new_rules[tuple(new_rule)] = None
             self.productions[A] = new_rules
 
-        updated = defaultdict(list)
+    @stage
+    def binarize(self):
+        """BIN: split every rule longer than two symbols into a chain of binary rules."""
+        updated = defaultdict(dict)
         for A in self.productions:
             for rule in self.productions[A]:
                 while len(rule) > 2:
                     B, C = rule[0], rule[1]
                     new_var = self._get_new_variable()
-                    updated[new_var].append([B, C])
-                    rule = [new_var] + rule[2:]
-                updated[A].append(rule)
+                    updated[new_var][(B, C)] = None
+                    rule = (new_var,) + rule[2:]
+                updated[A][rule] = None
         self.productions = updated
 
+    def convert_to_cnf_bounded(self, report=None):
+        """CNF in START, TERM, BIN, DEL, UNIT order, then drop useless symbols.
+
+        Binarizing before ε-removal leaves at most two nullable symbols per rule,
+        so DEL adds at most a constant factor and UNIT at most a quadratic one,
+        instead of the 2^k blow-up of remove_epsilon_productions on long rules.
+        Returns (stage, rules before, rules after) for each stage; report, if
+        given, is called with the same three values as each stage finishes.
+        """
+        stages = [
+            ("START", self.add_start_symbol),
+            ("TERM", self.replace_terminals),
+            ("BIN", self.binarize),
+            ("DEL", self.remove_epsilon_productions),
+            ("UNIT", self.remove_unit_productions),
+            ("USELESS", self.remove_useless_symbols),
+        ]
+        sizes = []
+        for name, stage in stages:
+            before = self.rule_count()
+            stage()
+            sizes.append((name, before, self.rule_count()))
+            if report is not None:
+                report(*sizes[-1])
+        return sizes
+
+    @stage
+    def remove_useless_symbols(self):
+        self.remove_non_productive_symbols()
+        self.remove_inaccessible_symbols()
+
+class CYKRecognizer:
+    """CYK membership over a CNF grammar, with chart cells as bitmasks over the variables.
+
+    Built from a converter after convert_to_cnf or convert_to_cnf_bounded.
+    Combined cell pairs are memoized in an LRU of cache_size entries.
+    """
+
+    def __init__(self, converter, cache_size=65536):
+        self.start_symbol = converter.start_symbol
+        self.variables = sorted(converter.productions, key=str)
+        self.bit = {A: 1 << i for i, A in enumerate(self.variables)}
+        self.terminal_masks = defaultdict(int)
+        self.accepts_empty = False  # a start rule S -> ε kept by remove_epsilon_productions
+        self.binary_rules = defaultdict(list)  # A -> [(B, C)], for the parse forest
+        pair_masks = defaultdict(lambda: defaultdict(int))  # B -> C -> mask of heads A -> B C
+        for A, rules in converter.productions.items():
+            for rule in rules:
+                if rule == ('ε',) and A == converter.start_symbol:
+                    self.accepts_empty = True
+                elif len(rule) == 1 and rule[0] in converter.terminals:
+                    self.terminal_masks[rule[0]] |= self.bit[A]
+                elif len(rule) == 2 and rule[0] in self.bit and rule[1] in self.bit:
+                    pair_masks[rule[0]][rule[1]] |= self.bit[A]
+                    self.binary_rules[A].append(rule)
+                else:
+                    raise ValueError(f"Rule {A} -> {' '.join(rule)} is not in CNF")
+        # by_left[i] lists (mask of C, mask of heads) for rules whose left child has bit i
+        self.by_left = [[(self.bit[C], heads) for C, heads in pair_masks[A].items()] for A in self.variables]
+        # (left cell, right cell) -> heads, shared across words; LRU-bounded so memory does not grow with the input
+        self._combine = functools.lru_cache(maxsize=cache_size)(self._combine_cells)
+
+    def _combine_cells(self, left, right):
+        heads = 0
+        bits = left
+        while bits:
+            low = bits & -bits
+            for right_mask, rule_heads in self.by_left[low.bit_length() - 1]:
+                if right & right_mask:
+                    heads |= rule_heads
+            bits ^= low
+        return heads
+
+    def chart(self, word):
+        """chart[length - 1][i] is the mask of variables deriving word[i:i + length]."""
+        n = len(word)
+        rows = [[self.terminal_masks.get(symbol, 0) for symbol in word]]
+        combine = self._combine
+        for length in range(2, n + 1):
+            row = []
+            for i in range(n - length + 1):
+                cell = 0
+                for split in range(1, length):
+                    left = rows[split - 1][i]
+                    if left:
+                        right = rows[length - split - 1][i + split]
+                        if right:
+                            cell |= combine(left, right)
+                row.append(cell)
+            rows.append(row)
+        return rows
+
+    def accepts(self, word):
+        if not word:
+            return self.accepts_empty
+        if self.start_symbol not in self.bit:
+            return False
+        return bool(self.chart(word)[-1][0] & self.bit[self.start_symbol])
+
+    def accepts_many(self, words):
+        return [self.accepts(word) for word in words]
+
+    def parse_forest(self, word):
+        """Shared packed forest {(A, i, j): [((B, i, k), (C, k, j)) or (terminal,)]}, or None if rejected."""
+        if not self.accepts(word):
+            return None
+        rows = self.chart(word)
+        root = (self.start_symbol, 0, len(word))
+        forest = {}
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node in forest:
+                continue
+            A, i, j = node
+            if j - i == 1:
+                forest[node] = [(word[i],)]
+                continue
+            alternatives = forest[node] = []
+            for k in range(i + 1, j):
+                left, right = rows[k - i - 1][i], rows[j - k - 1][k]
+                for B, C in self.binary_rules[A]:
+                    if left & self.bit[B] and right & self.bit[C]:
+                        children = ((B, i, k), (C, k, j))
+                        alternatives.append(children)
+                        stack.extend(children)
+        return forest
+
+
 # Sample CFG
 VN = {'S', 'A', 'B', 'C', 'E'}
 VT = {'a', 'b'}
@@ -158,22 +398,31 @@ P = [
 ]
 S = 'S'
 
-print("VARIANT 22 ")
+if __name__ == "__main__":
+    print("VARIANT 22 ")
+
+    converter = CFGtoCNFConverter(VN, VT, P, S)
+    converter.print_grammar_step("Original Grammar")
+
+    converter.remove_epsilon_productions()
+    converter.print_grammar_step("Step 1: Eliminate ε productions")
 
-converter = CFGtoCNFConverter(VN, VT, P, S)
-converter.print_grammar_step("Original Grammar")
+    converter.remove_unit_productions()
+    converter.print_grammar_step("Step 2: Eliminate renaming")
 
-converter.remove_epsilon_productions()
-converter.print_grammar_step("Step 1: Eliminate ε productions")
+    converter.remove_non_productive_symbols()
+    converter.print_grammar_step("Step 3: Eliminate nonproductive symbols")
 
-converter.remove_unit_productions()
-converter.print_grammar_step("Step 2: Eliminate renaming")
+    converter.remove_inaccessible_symbols()
+    converter.print_grammar_step("Step 4: Eliminate inaccessible symbols")
 
-converter.remove_non_productive_symbols()
-converter.print_grammar_step("Step 3: Eliminate nonproductive symbols")
+    converter.convert_to_cnf()
+    converter.print_grammar_step("Step 5: Convert to CNF")
 
-converter.remove_inaccessible_symbols()
-converter.print_grammar_step("Step 4: Eliminate inaccessible symbols")
+    bounded = CFGtoCNFConverter(VN, VT, P, S)
+    bounded.convert_to_cnf_bounded(report=lambda stage, before, after: print(f"{stage}: {before} -> {after} rules"))
+    bounded.print_grammar_step("Bounded CNF (START, TERM, BIN, DEL, UNIT)")
 
-converter.convert_to_cnf()
-converter.print_grammar_step("Step 5: Convert to CNF")
+    cyk = CYKRecognizer(bounded)
+    words = ["ab", "aab", "abab", "ba"]
+    print("CYK:", dict(zip(words, cyk.accepts_many([list(word) for word in words]))))
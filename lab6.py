@@ -1,6 +1,17 @@
+import math
+import operator
 import re
+import weakref
+from bisect import bisect_left
+from array import array
+from collections import OrderedDict
 from enum import Enum
 
+try:
+    import numpy as np
+except ImportError:  # CompiledExpression.evaluate_many needs NumPy
+    np = None
+
 
 class TokenType(Enum):
     NUMBER = "NUMBER"
@@ -23,50 +34,105 @@ class Token:
         return f"Token({self.type}, {self.value})"
 
 
+TOKEN_KINDS = list(TokenType)
+TOKEN_CODES = {token_type: code for code, token_type in enumerate(TOKEN_KINDS)}
+
+
+class TokenBuffer:
+    """Columnar token stream: a type code and start/end offsets per token, values sliced on access."""
+
+    def __init__(self, text):
+        self.text = text
+        self.types = array('B')
+        self.starts = array('Q')
+        self.ends = array('Q')
+
+    def append(self, token_type, start, end):
+        self.types.append(TOKEN_CODES[token_type])
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self):
+        return len(self.types)
+
+    def type_at(self, index):
+        return TOKEN_KINDS[self.types[index]].value
+
+    def value_at(self, index):
+        return self.text[self.starts[index]:self.ends[index]]
+
+    def __getitem__(self, index):
+        return Token(TOKEN_KINDS[self.types[index]], self.value_at(index))
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+
 class Lexer:
+    token_patterns = [
+        (r'\d+\.\d+|\d+', TokenType.NUMBER),
+        (r'\+', TokenType.PLUS),
+        (r'-', TokenType.MINUS),
+        (r'\*', TokenType.MULTIPLY),
+        (r'/', TokenType.DIVIDE),
+        (r'\(', TokenType.LPAREN),
+        (r'\)', TokenType.RPAREN),
+        (r'sin', TokenType.SIN),
+        (r'cos', TokenType.COS)
+    ]
+    # One alternation tried in the order above; whitespace and stray characters get their own groups
+    master_pattern = re.compile(
+        '|'.join(f'(?P<{token_type.name}>{pattern})' for pattern, token_type in token_patterns)
+        + r'|(?P<SKIP>\s+)|(?P<MISMATCH>.)',
+        re.DOTALL,
+    )
+    group_types = {token_type.name: token_type for _, token_type in token_patterns}
+
     def __init__(self, text):
         self.text = text
         self.pos = 0
-        self.token_patterns = [
-            (r'\d+\.\d+|\d+', TokenType.NUMBER),
-            (r'\+', TokenType.PLUS),
-            (r'-', TokenType.MINUS),
-            (r'\*', TokenType.MULTIPLY),
-            (r'/', TokenType.DIVIDE),
-            (r'\(', TokenType.LPAREN),
-            (r'\)', TokenType.RPAREN),
-            (r'sin', TokenType.SIN),
-            (r'cos', TokenType.COS)
-        ]
 
     def tokenize(self):
         tokens = []
-        while self.pos < len(self.text):
-            match = None
-            for pattern, token_type in self.token_patterns:
-                regex = re.compile(pattern)
-                match = regex.match(self.text, self.pos)
-                if match:
-                    tokens.append(Token(token_type, match.group(0)))
-                    self.pos = match.end()
-                    break
-
-            if not match:
-                if self.text[self.pos].isspace():
-                    self.pos += 1
-                    continue
-                raise ValueError(f"Unexpected character: {self.text[self.pos]}")
-
+        group_types = self.group_types
+        for match in self.master_pattern.finditer(self.text, self.pos):
+            kind = match.lastgroup
+            if kind == 'SKIP':
+                continue
+            if kind == 'MISMATCH':
+                self.pos = match.start()
+                raise ValueError(f"Unexpected character: {match.group()}")
+            tokens.append(Token(group_types[kind], match.group()))
+        self.pos = len(self.text)
         return tokens
 
+    def tokenize_buffer(self):
+        """Like tokenize, but record offsets in a TokenBuffer instead of building Token objects."""
+        buffer = TokenBuffer(self.text)
+        group_types = self.group_types
+        for match in self.master_pattern.finditer(self.text, self.pos):
+            kind = match.lastgroup
+            if kind == 'SKIP':
+                continue
+            if kind == 'MISMATCH':
+                self.pos = match.start()
+                raise ValueError(f"Unexpected character: {match.group()}")
+            buffer.append(group_types[kind], match.start(), match.end())
+        self.pos = len(self.text)
+        return buffer
+
 
 # AST Node Classes
 class ASTNode:
+    __slots__ = ('__weakref__',)
+
     def pretty_print(self, level=0):
         raise NotImplementedError("Subclasses must implement pretty_print")
 
 
 class NumberNode(ASTNode):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
@@ -75,6 +141,8 @@ class NumberNode(ASTNode):
 
 
 class BinaryOpNode(ASTNode):
+    __slots__ = ('left', 'operator', 'right')
+
     def __init__(self, left, operator, right):
         self.left = left
         self.operator = operator
@@ -88,6 +156,8 @@ class BinaryOpNode(ASTNode):
 
 
 class UnaryOpNode(ASTNode):
+    __slots__ = ('operator', 'operand')
+
     def __init__(self, operator, operand):
         self.operator = operator
         self.operand = operand
@@ -98,17 +168,37 @@ class UnaryOpNode(ASTNode):
         return result
 
 
+class VariableNode(ASTNode):
+    """Named input leaf for ASTs built in code; the lexer has no identifiers."""
+
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def pretty_print(self, level=0):
+        return f"{'    ' * level}└── VARIABLE({self.name})"
+
+
 # Parser
 class Parser:
     def __init__(self, tokens):
-        self.tokens = tokens
+        self.tokens = tokens  # a list of Token or a TokenBuffer
         self.pos = 0
+        if isinstance(tokens, TokenBuffer):
+            self.type_at, self.value_at = tokens.type_at, tokens.value_at
+        else:
+            self.type_at = lambda index: tokens[index].type
+            self.value_at = lambda index: tokens[index].value
 
     def current_token(self):
         return self.tokens[self.pos] if self.pos < len(self.tokens) else None
 
+    def current_type(self):
+        return self.type_at(self.pos) if self.pos < len(self.tokens) else None
+
     def eat(self, token_type):
-        if self.current_token() and self.current_token().type == token_type.value:
+        if self.current_type() == token_type.value:
             self.pos += 1
         else:
             raise ValueError(f"Expected token {token_type}, got {self.current_token()}")
@@ -117,55 +207,591 @@ class Parser:
         return self.expr()
 
     def factor(self):
-        token = self.current_token()
+        token_type = self.current_type()
 
-        if token.type == TokenType.NUMBER.value:
+        if token_type == TokenType.NUMBER.value:
+            value = self.value_at(self.pos)
             self.eat(TokenType.NUMBER)
-            return NumberNode(float(token.value))
+            return NumberNode(float(value))
 
-        elif token.type == TokenType.LPAREN.value:
+        elif token_type == TokenType.LPAREN.value:
             self.eat(TokenType.LPAREN)
             node = self.expr()
             self.eat(TokenType.RPAREN)
             return node
 
-        elif token.type in {TokenType.SIN.value, TokenType.COS.value}:
-            self.eat(TokenType(token.type))
+        elif token_type in {TokenType.SIN.value, TokenType.COS.value}:
+            self.eat(TokenType(token_type))
             operand = self.factor()
-            return UnaryOpNode(token.type, operand)
+            return UnaryOpNode(token_type, operand)
 
-        raise ValueError(f"Unexpected token: {token}")
+        raise ValueError(f"Unexpected token: {self.current_token()}")
 
     def term(self):
         node = self.factor()
 
-        while self.current_token() and self.current_token().type in {TokenType.MULTIPLY.value, TokenType.DIVIDE.value}:
-            token = self.current_token()
-            self.eat(TokenType(token.type))
-            node = BinaryOpNode(node, token.type, self.factor())
+        while self.current_type() in {TokenType.MULTIPLY.value, TokenType.DIVIDE.value}:
+            token_type = self.current_type()
+            self.eat(TokenType(token_type))
+            node = BinaryOpNode(node, token_type, self.factor())
 
         return node
 
     def expr(self):
         node = self.term()
 
-        while self.current_token() and self.current_token().type in {TokenType.PLUS.value, TokenType.MINUS.value}:
-            token = self.current_token()
-            self.eat(TokenType(token.type))
-            node = BinaryOpNode(node, token.type, self.term())
+        while self.current_type() in {TokenType.PLUS.value, TokenType.MINUS.value}:
+            token_type = self.current_type()
+            self.eat(TokenType(token_type))
+            node = BinaryOpNode(node, token_type, self.term())
 
         return node
 
 
-# Example usage
-input_text = "3 * sin(30) + 4 / (2 + cos(60))"
-lexer = Lexer(input_text)
-tokens = lexer.tokenize()
-print("Tokens:")
-for token in tokens:
-    print(token)  # Print each token on a new line
+class PrecedenceParser(Parser):
+    """Parser with explicit operator/operand stacks: no recursion, so nesting depth is unlimited."""
 
-parser = Parser(tokens)
-ast = parser.parse()
-print("\nAST:")
-print(ast.pretty_print())
+    precedence = {
+        TokenType.PLUS.value: 1,
+        TokenType.MINUS.value: 1,
+        TokenType.MULTIPLY.value: 2,
+        TokenType.DIVIDE.value: 2,
+    }
+    functions = {TokenType.SIN.value, TokenType.COS.value}
+
+    def parse(self):
+        precedence, functions = self.precedence, self.functions
+        type_at, value_at = self.type_at, self.value_at
+        number, lparen, rparen = TokenType.NUMBER.value, TokenType.LPAREN.value, TokenType.RPAREN.value
+        operands = []
+        operators = []  # binary operators, function names and LPAREN markers
+        depth = 0
+        expect_operand = True
+        end = len(self.tokens)
+
+        while True:
+            token_type = type_at(self.pos) if self.pos < end else None
+
+            if expect_operand:
+                if token_type == number:
+                    operands.append(NumberNode(float(value_at(self.pos))))
+                elif token_type == lparen:
+                    operators.append(lparen)
+                    depth += 1
+                    self.pos += 1
+                    continue
+                elif token_type in functions:
+                    operators.append(token_type)
+                    self.pos += 1
+                    continue
+                else:
+                    raise ValueError(f"Unexpected token: {self.current_token()}")
+                self.pos += 1
+                self._apply_functions(operands, operators)
+                expect_operand = False
+
+            elif token_type in precedence:
+                rank = precedence[token_type]
+                while operators and precedence.get(operators[-1], 0) >= rank:
+                    self._apply_binary(operands, operators)
+                operators.append(token_type)
+                self.pos += 1
+                expect_operand = True
+
+            elif depth:
+                if token_type != rparen:
+                    self.eat(TokenType.RPAREN)  # raises the usual "Expected token" error
+                while operators[-1] != lparen:
+                    self._apply_binary(operands, operators)
+                operators.pop()
+                depth -= 1
+                self.pos += 1
+                self._apply_functions(operands, operators)
+
+            else:
+                # like Parser.expr, stop at the first token that cannot continue the expression
+                while operators:
+                    self._apply_binary(operands, operators)
+                return operands[0]
+
+    def _apply_binary(self, operands, operators):
+        right = operands.pop()
+        operands.append(BinaryOpNode(operands.pop(), operators.pop(), right))
+
+    def _apply_functions(self, operands, operators):
+        while operators and operators[-1] in self.functions:
+            operands.append(UnaryOpNode(operators.pop(), operands.pop()))
+
+
+# Compilation
+CONST, LOAD, UNARY, BINARY = range(4)
+
+BINARY_OPERATORS = {
+    TokenType.PLUS.value: operator.add,
+    TokenType.MINUS.value: operator.sub,
+    TokenType.MULTIPLY.value: operator.mul,
+    TokenType.DIVIDE.value: operator.truediv,
+}
+SCALAR_FUNCTIONS = {TokenType.SIN.value: math.sin, TokenType.COS.value: math.cos}
+ARRAY_FUNCTIONS = {TokenType.SIN.value: "sin", TokenType.COS.value: "cos"}
+
+
+def postorder(root):
+    """Yield the nodes of an AST children-first, without recursion."""
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded or isinstance(node, (NumberNode, VariableNode)):
+            yield node
+        elif isinstance(node, BinaryOpNode):
+            stack.extend(((node, True), (node.right, False), (node.left, False)))
+        else:
+            stack.extend(((node, True), (node.operand, False)))
+
+
+class CompiledExpression:
+    """An AST lowered to a flat postfix program, with constant subtrees folded away."""
+
+    def __init__(self, root):
+        program = []
+        for node in postorder(root):
+            if isinstance(node, NumberNode):
+                program.append((CONST, node.value))
+            elif isinstance(node, VariableNode):
+                program.append((LOAD, node.name))
+            elif isinstance(node, UnaryOpNode):
+                if program[-1][0] == CONST and self._fold(program, 1, SCALAR_FUNCTIONS[node.operator]):
+                    continue
+                program.append((UNARY, node.operator))
+            else:
+                if program[-1][0] == CONST and program[-2][0] == CONST and \
+                        self._fold(program, 2, BINARY_OPERATORS[node.operator]):
+                    continue
+                program.append((BINARY, node.operator))
+        self.program = program
+        self.variables = sorted({name for code, name in program if code == LOAD})
+        self._scalar = self._resolve(SCALAR_FUNCTIONS)
+
+    @staticmethod
+    def _fold(program, arity, function):
+        # the trailing CONST instructions are exactly the operands of this node
+        try:
+            value = function(*(arg for _, arg in program[-arity:]))
+        except (ArithmeticError, ValueError):
+            return False  # leave it to fail at run time, like the unfolded tree would
+        program[-arity:] = [(CONST, value)]
+        return True
+
+    def _resolve(self, functions):
+        return [(code, functions[arg] if code == UNARY else BINARY_OPERATORS[arg] if code == BINARY else arg)
+                for code, arg in self.program]
+
+    @staticmethod
+    def _run(program, variables):
+        stack = []
+        for code, arg in program:
+            if code == CONST:
+                stack.append(arg)
+            elif code == LOAD:
+                stack.append(variables[arg])
+            elif code == UNARY:
+                stack[-1] = arg(stack[-1])
+            else:
+                right = stack.pop()
+                stack[-1] = arg(stack[-1], right)
+        return stack[0]
+
+    def is_constant(self):
+        return len(self.program) == 1 and self.program[0][0] == CONST
+
+    def __call__(self, **variables):
+        return self._run(self._scalar, variables)
+
+    def evaluate_many(self, **arrays):
+        """Evaluate over NumPy arrays of inputs, one vectorized operation per instruction."""
+        if np is None:
+            raise ImportError("evaluate_many requires NumPy")
+        program = self._resolve({name: getattr(np, function) for name, function in ARRAY_FUNCTIONS.items()})
+        arrays = {name: np.asarray(values, dtype=float) for name, values in arrays.items()}
+        result = np.asarray(self._run(program, arrays), dtype=float)
+        if arrays:
+            result = np.broadcast_to(result, np.broadcast(*arrays.values()).shape)
+        return result
+
+
+def compile_expression(root):
+    return CompiledExpression(root)
+
+
+# Interning and caching
+class FrozenNode:
+    """Mixin for interned nodes: they are shared between trees, so assigning a field raises AttributeError."""
+
+    __slots__ = ()
+
+    @classmethod
+    def build(cls, **fields):
+        node = cls.__new__(cls)
+        for name, value in fields.items():
+            object.__setattr__(node, name, value)
+        return node
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"interned {type(self).__name__} is shared and read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"interned {type(self).__name__} is shared and read-only")
+
+    def __reduce__(self):
+        fields = {name: getattr(self, name) for klass in type(self).__mro__
+                  for name in getattr(klass, '__slots__', ()) if name != '__weakref__'}
+        return _build_frozen, (type(self), fields)
+
+
+def _build_frozen(cls, fields):
+    return cls.build(**fields)
+
+
+class FrozenNumberNode(FrozenNode, NumberNode):
+    __slots__ = ()
+
+
+class FrozenVariableNode(FrozenNode, VariableNode):
+    __slots__ = ()
+
+
+class FrozenUnaryOpNode(FrozenNode, UnaryOpNode):
+    __slots__ = ()
+
+
+class FrozenBinaryOpNode(FrozenNode, BinaryOpNode):
+    __slots__ = ()
+
+
+class NodeInterner:
+    """Hash-consing table: structurally equal subtrees come back as one shared, read-only node."""
+
+    def __init__(self):
+        # children are interned first, so their identity stands in for their structure
+        self.table = weakref.WeakValueDictionary()
+
+    def _lookup(self, key, build):
+        node = self.table.get(key)
+        if node is None:
+            node = self.table[key] = build()
+        return node
+
+    def number(self, value):
+        return self._lookup((NumberNode, value), lambda: FrozenNumberNode.build(value=value))
+
+    def variable(self, name):
+        return self._lookup((VariableNode, name), lambda: FrozenVariableNode.build(name=name))
+
+    def unary(self, operator, operand):
+        return self._lookup((UnaryOpNode, operator, id(operand)), lambda: FrozenUnaryOpNode.build(operator=operator, operand=operand))
+
+    def binary(self, left, operator, right):
+        return self._lookup((BinaryOpNode, id(left), operator, id(right)), lambda: FrozenBinaryOpNode.build(left=left, operator=operator, right=right))
+
+    def intern(self, root):
+        shared = {}
+        for node in postorder(root):
+            if isinstance(node, NumberNode):
+                result = self.number(node.value)
+            elif isinstance(node, VariableNode):
+                result = self.variable(node.name)
+            elif isinstance(node, UnaryOpNode):
+                result = self.unary(node.operator, shared[id(node.operand)])
+            else:
+                result = self.binary(shared[id(node.left)], node.operator, shared[id(node.right)])
+            shared[id(node)] = result
+        return shared[id(root)]
+
+    def __len__(self):
+        return len(self.table)
+
+
+class ParseCache:
+    """Bounded LRU cache from normalized expression text to an interned AST root."""
+
+    def __init__(self, maxsize=1024, parser_class=PrecedenceParser, interner=None):
+        self.maxsize = maxsize
+        self.parser_class = parser_class
+        self.interner = interner if interner is not None else NodeInterner()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize(tokens):
+        # one space between lexemes re-lexes to the same tokens, whatever the original spacing
+        return " ".join(tokens.value_at(index) for index in range(len(tokens)))
+
+    def parse(self, text):
+        tokens = Lexer(text).tokenize_buffer()
+        key = self.normalize(tokens)
+        root = self.entries.get(key)
+        if root is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return root
+
+        self.misses += 1
+        root = self.interner.intern(self.parser_class(tokens).parse())
+        self.entries[key] = root
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return root
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "interned_nodes": len(self.interner),
+        }
+
+    def clear(self):
+        self.entries.clear()
+
+
+# Incremental editing
+class IncrementalDocument:
+    """Expression text with its TokenBuffer and AST, kept in sync under small edits.
+
+    Every node records (width, wraps): the number of tokens it spans, counting
+    the wraps pairs of parentheses directly around it. Widths do not move when
+    tokens are inserted elsewhere, so edit() can find the smallest subtree
+    covering the re-lexed tokens by walking down from the root. It re-parses
+    only that subtree and rebuilds the path above it. Every other node is
+    reused as is. reparsed_tokens holds the size of the last re-parse.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = Lexer(text).tokenize_buffer()
+        self.spans = {}  # node -> (width, wraps), for the nodes of the current tree only
+        self.root = self._full_parse(self.tokens)
+
+    def edit(self, offset, deleted, inserted):
+        """Replace text[offset:offset + deleted] with inserted; returns the new AST root.
+
+        Raises ValueError like Lexer and Parser do, leaving the document unchanged.
+        """
+        text = self.text[:offset] + inserted + self.text[offset + deleted:]
+        tokens, first, old_end, new_end = self._relex(text, offset, deleted, inserted)
+        old = self.tokens
+        if new_end - first == old_end - first and all(
+                tokens.types[i] == old.types[i] and tokens.value_at(i) == old.value_at(i) for i in range(first, new_end)):
+            self.text, self.tokens = text, tokens  # only offsets moved
+            self.reparsed_tokens = 0
+            return self.root
+
+        root = self._reparse(tokens, first, old_end, new_end - old_end)
+        self.text, self.tokens, self.root = text, tokens, root
+        return root
+
+    def _relex(self, text, offset, deleted, inserted):
+        """Lex from the first token the edit can touch until the scan lines up with an old token again."""
+        old = self.tokens
+        n = len(old)
+        first = bisect_left(old.ends, offset)
+        if first and old.ends[first - 1] == offset - 1 and old.types[first - 1] == TOKEN_CODES[TokenType.NUMBER]:
+            first -= 1  # "1" + ".5" typed after "1." still merges into one number
+        start = min(old.starts[first], offset) if first < n else offset
+        delta = len(inserted) - deleted
+        edit_end = offset + len(inserted)
+
+        relexed = TokenBuffer(text)
+        resume = n
+        for match in Lexer.master_pattern.finditer(text, start):
+            kind = match.lastgroup
+            if kind == 'SKIP':
+                continue
+            if kind == 'MISMATCH':
+                raise ValueError(f"Unexpected character: {match.group()}")
+            if match.start() >= edit_end:
+                old_start = match.start() - delta
+                k = bisect_left(old.starts, old_start, first)
+                if k < n and old.starts[k] == old_start:
+                    resume = k  # same suffix from a token start, so the rest lexes exactly as before
+                    break
+            relexed.append(Lexer.group_types[kind], match.start(), match.end())
+
+        tokens = TokenBuffer(text)
+        tokens.types = old.types[:first] + relexed.types + old.types[resume:]
+        tokens.starts = old.starts[:first] + relexed.starts + array('Q', (pos + delta for pos in old.starts[resume:]))
+        tokens.ends = old.ends[:first] + relexed.ends + array('Q', (pos + delta for pos in old.ends[resume:]))
+        return tokens, first, resume, first + len(relexed)
+
+    def _reparse(self, tokens, first, old_end, shift):
+        """Re-parse the smallest enclosing subtree that still parses as a unit with the same binding."""
+        spans = self.spans
+        if old_end > spans[self.root][0]:
+            return self._full_parse(tokens)  # the edit touches tokens the parser stopped before
+
+        # walk down to the deepest node whose token range covers [first, old_end)
+        path = [(self.root, 0, None)]
+        while True:
+            node, start, _ = path[-1]
+            inner = start + spans[node][1]
+            if isinstance(node, BinaryOpNode):
+                children = ((node.left, inner, 'left'), (node.right, inner + spans[node.left][0] + 1, 'right'))
+            elif isinstance(node, UnaryOpNode):
+                children = ((node.operand, inner + 1, 'operand'),)
+            else:
+                children = ()
+            for child, child_start, branch in children:
+                if child_start <= first and old_end <= child_start + spans[child][0]:
+                    path.append((child, child_start, branch))
+                    break
+            else:
+                break
+
+        spent = largest = 0
+        for depth in range(len(path) - 1, -1, -1):
+            node, start, _ = path[depth]
+            width, wraps = spans[node]
+            end = start + width + shift
+            # with the damage right of a bare operator, the left operand is reused as parsed
+            reuse_left = (not wraps and isinstance(node, BinaryOpNode)
+                          and depth + 1 < len(path) and path[depth + 1][2] == 'right')
+            lo = start + spans[node.left][0] if reuse_left else start
+            if not reuse_left and spent < end - lo < 2 * largest:
+                continue  # past what was already spent, retry whole subtrees only at doubling sizes
+            spent += end - lo
+            largest = max(largest, end - lo)
+            try:
+                replacement, stop, new_spans = self._parse_range(
+                    tokens, lo, end, (node.left, start) if reuse_left else None)
+            except ValueError:
+                continue
+            # the new subtree must bind at least as tightly, or the context would regroup around it;
+            # the root has no context, only tokens the parser already stopped at
+            if stop != end or depth and self._binding(replacement, new_spans) < self._binding(node, spans):
+                continue
+
+            self.reparsed_tokens = end - lo
+            for old in postorder(node.right) if reuse_left else postorder(node):
+                del spans[old]
+            spans.pop(node, None)
+            spans.update(new_spans)
+            for parent, _, _ in reversed(path[:depth]):
+                branch = path[depth][2]
+                if branch == 'left':
+                    rebuilt = BinaryOpNode(replacement, parent.operator, parent.right)
+                elif branch == 'right':
+                    rebuilt = BinaryOpNode(parent.left, parent.operator, replacement)
+                else:
+                    rebuilt = UnaryOpNode(parent.operator, replacement)
+                parent_width, parent_wraps = spans.pop(parent)
+                spans[rebuilt] = (parent_width + shift, parent_wraps)
+                replacement = rebuilt
+                depth -= 1
+            return replacement
+        return self._full_parse(tokens)
+
+    def _full_parse(self, tokens):
+        self.reparsed_tokens = len(tokens)
+        root, _, self.spans = self._parse_range(tokens, 0, len(tokens))
+        return root
+
+    @staticmethod
+    def _binding(node, spans):
+        if spans[node][1] or not isinstance(node, BinaryOpNode):
+            return 3  # numbers, function calls and parenthesized groups are atoms
+        return PrecedenceParser.precedence[node.operator]
+
+    def _parse_range(self, tokens, lo, hi, left=None):
+        """PrecedenceParser over tokens[lo:hi], optionally continuing after an already parsed (node, start).
+
+        Returns the root, the position parsing stopped at and the spans of the nodes it built.
+        """
+        precedence, functions = PrecedenceParser.precedence, PrecedenceParser.functions
+        number, lparen, rparen = TokenType.NUMBER.value, TokenType.LPAREN.value, TokenType.RPAREN.value
+        types, kinds = tokens.types, [token_type.value for token_type in TOKEN_KINDS]
+        spans = {}
+        operands = []  # (node, first token)
+        operators = []  # (token type, position)
+        if left is not None:
+            spans[left[0]] = self.spans[left[0]]
+            operands.append(left)
+
+        def apply_binary():
+            right, right_start = operands.pop()
+            left, left_start = operands.pop()
+            node = BinaryOpNode(left, operators.pop()[0], right)
+            spans[node] = (right_start + spans[right][0] - left_start, 0)
+            operands.append((node, left_start))
+
+        def apply_functions():
+            while operators and operators[-1][0] in functions:
+                function, function_start = operators.pop()
+                operand, operand_start = operands.pop()
+                node = UnaryOpNode(function, operand)
+                spans[node] = (operand_start + spans[operand][0] - function_start, 0)
+                operands.append((node, function_start))
+
+        pos = lo
+        depth = 0
+        expect_operand = left is None
+        while True:
+            token_type = kinds[types[pos]] if pos < hi else None
+            if expect_operand:
+                if token_type == number:
+                    node = NumberNode(float(tokens.value_at(pos)))
+                    spans[node] = (1, 0)
+                    operands.append((node, pos))
+                    pos += 1
+                    apply_functions()
+                    expect_operand = False
+                elif token_type == lparen or token_type in functions:
+                    operators.append((token_type, pos))
+                    depth += token_type == lparen
+                    pos += 1
+                else:
+                    raise ValueError(f"Unexpected token: {tokens[pos] if pos < hi else None}")
+            elif token_type in precedence:
+                while operators and precedence.get(operators[-1][0], 0) >= precedence[token_type]:
+                    apply_binary()
+                operators.append((token_type, pos))
+                pos += 1
+                expect_operand = True
+            elif depth:
+                if token_type != rparen:
+                    raise ValueError(f"Expected token {TokenType.RPAREN}, got {tokens[pos] if pos < hi else None}")
+                while operators[-1][0] != lparen:
+                    apply_binary()
+                _, open_pos = operators.pop()
+                node, _ = operands.pop()
+                spans[node] = (pos + 1 - open_pos, spans[node][1] + 1)
+                operands.append((node, open_pos))
+                depth -= 1
+                pos += 1
+                apply_functions()
+            else:
+                while operators:
+                    apply_binary()
+                if left is not None:
+                    del spans[left[0]]  # the caller's entry stays authoritative
+                return operands[0][0], pos, spans
+
+
+if __name__ == "__main__":
+    # Example usage
+    input_text = "3 * sin(30) + 4 / (2 + cos(60))"
+    lexer = Lexer(input_text)
+    tokens = lexer.tokenize()
+    print("Tokens:")
+    for token in tokens:
+        print(token)  # Print each token on a new line
+
+    parser = Parser(tokens)
+    ast = parser.parse()
+    print("\nAST:")
+    print(ast.pretty_print())
+    print("\nValue:", compile_expression(ast)())
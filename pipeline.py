@@ -0,0 +1,136 @@
+"""Bulk evaluation of lab6 expressions from a JSONL file, batched over a process pool.
+
+    python pipeline.py expressions.jsonl                     # results to stdout
+    python pipeline.py expressions.jsonl -o results.jsonl    # results to a file
+    python pipeline.py expressions.jsonl --workers 1         # single process
+
+Each input line is a JSON string, or an object holding the expression under
+--field. Each output line is {"line": n, "value": x} or {"line": n, "error": message},
+in input order. A throughput and latency summary goes to stderr at the end.
+"""
+import argparse
+import json
+import math
+import sys
+import time
+from functools import lru_cache
+from itertools import count, islice
+
+from corpus import ordered_map
+from lab6 import Lexer, PrecedenceParser, compile_expression
+
+
+@lru_cache(maxsize=4096)  # per worker process; expressions have no variables, so text fixes the value
+def evaluate(text):
+    tokens = Lexer(text).tokenize_buffer()
+    parser = PrecedenceParser(tokens)
+    root = parser.parse()
+    if parser.pos != len(tokens):  # the parser stops quietly at the first token it cannot use
+        raise ValueError(f"Unexpected token: {tokens[parser.pos]}")
+    value = compile_expression(root)()
+    if not math.isfinite(value):
+        raise ValueError(f"Result is not finite: {value}")
+    return value
+
+
+def evaluate_batch(args):
+    """Evaluate one batch; returns its output lines, the error count and the seconds spent."""
+    first_line, lines, field = args
+    start = time.perf_counter()
+    output = []
+    errors = 0
+    for number, line in enumerate(lines, first_line):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            text = item if isinstance(item, str) else item.get(field) if isinstance(item, dict) else None
+            if not isinstance(text, str):
+                raise ValueError(f"No expression string under {field!r}")
+            record = {"line": number, "value": evaluate(text)}
+        except (ValueError, ArithmeticError) as error:
+            record = {"line": number, "error": str(error)}
+            errors += 1
+        output.append(json.dumps(record, allow_nan=False) + "\n")
+    return output, errors, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def run_pipeline(source, output, batch_size=1000, workers=None, window=None, field="expression", summary=sys.stderr):
+    """Evaluate every line of source and write the results to output; returns the summary as a dict.
+
+    source and output are paths or open text streams. Lines are read lazily, batch_size
+    at a time, and at most window batches (default twice the workers) are in flight,
+    so memory stays bounded however long the input is.
+    """
+    submitted = {}  # batch index -> time it was handed to the pool, for submit-to-result latency
+
+    def batches(stream):
+        first_line = 1
+        for index in count():
+            lines = list(islice(stream, batch_size))
+            if not lines:
+                return
+            submitted[index] = time.perf_counter()
+            yield first_line, lines, field
+            first_line += len(lines)
+
+    close_source, close_output = isinstance(source, str), isinstance(output, str)
+    source_stream = open(source, encoding="utf-8") if close_source else source
+    output_stream = open(output, "w", encoding="utf-8") if close_output else output
+    start = time.perf_counter()
+    latencies, busy = [], 0.0
+    lines = errors = 0
+    try:
+        for index, (records, batch_errors, seconds) in enumerate(
+                ordered_map(evaluate_batch, batches(source_stream), workers, window)):
+            output_stream.write("".join(records))
+            latencies.append(time.perf_counter() - submitted.pop(index))
+            busy += seconds
+            lines += len(records)
+            errors += batch_errors
+    finally:
+        if close_source:
+            source_stream.close()
+        if close_output:
+            output_stream.close()
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "lines": lines,
+        "errors": errors,
+        "batches": len(latencies),
+        "seconds": elapsed,
+        "lines_per_second": lines / elapsed if elapsed else float("inf"),
+        "worker_seconds": busy,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_max": max(latencies, default=0.0),
+    }
+    if summary is not None:
+        print(f"{lines} lines ({errors} errors) in {elapsed:.2f} s: {stats['lines_per_second']:,.0f} lines/s, "
+              f"{busy:.2f} s of worker time", file=summary)
+        print(f"batch latency over {len(latencies)} batches of {batch_size}: p50 {stats['latency_p50'] * 1000:.1f} ms, "
+              f"p95 {stats['latency_p95'] * 1000:.1f} ms, max {stats['latency_max'] * 1000:.1f} ms", file=summary)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of expressions, or - for stdin")
+    parser.add_argument("-o", "--output", help="output JSONL file (default stdout)")
+    parser.add_argument("--field", default="expression", help="key of the expression in JSON object lines")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, help="processes (default: CPU count; 1 runs inline)")
+    parser.add_argument("--window", type=int, help="batches in flight (default: twice the workers)")
+    args = parser.parse_args(argv)
+    run_pipeline(sys.stdin if args.input == "-" else args.input, args.output or sys.stdout,
+                 args.batch_size, args.workers, args.window, args.field)
+
+
+if __name__ == "__main__":
+    main()